@@ -1,20 +1,39 @@
 import os
+import asyncio
 import logging
 import time
 import sys
+import socket
+
+# Start of application imports, reported with the other startup timings at /metrics.
+_imports_started = time.perf_counter()
 
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from services.agent import initialize_agent_and_plugins, shutdown_plugins
+from services.agent import initialize_agent_and_plugins, create_model_router, shutdown_plugins
+from services import metrics
+from services.cache import create_cache_from_env
+from services.compaction import run_compaction_loop, COMPACTION_INTERVAL_SECONDS
+from services.feedback import FeedbackBuffer
 from services.conversation_store import CosmosConversationStore
+from services.profiling import start_request_profile, finish_request_profile
+from services.startup import log_import_time_audit, IMPORT_TIME_AUDIT
+from services.serialization import FastJSONResponse
 from routes.chat import router as chat_router
+from routes.ws import router as ws_router
+from routes.sessions import router as sessions_router
+from routes.feedback import router as feedback_router
+from routes.debug import router as debug_router
+
+IMPORT_SECONDS = time.perf_counter() - _imports_started
 
 
 # Initialize FastAPI app
 app = FastAPI(title="AI Agent Backend",
               description="AI Agent Backend built on Semantic Kernel SDK for Python/FastAPI",
               version="0.0.1",
+              default_response_class=FastJSONResponse,
               debug=False)
 
 
@@ -24,38 +43,63 @@ async def lifespan(app):
 
     logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     logger = logging.getLogger("backend.app")
+    init_started = time.perf_counter()
 
     try:
-        kernel, agent, plugins = await initialize_agent_and_plugins()
+        # Import-time audit in a child process (IMPORT_TIME_AUDIT); does not delay startup
+        if IMPORT_TIME_AUDIT:
+            app.state.import_audit_task = asyncio.create_task(log_import_time_audit())
+
+        cache = None
+        try:
+            cache = create_cache_from_env()
+            app.state.cache = cache
+        except Exception:
+            logger.exception("Failed to initialize shared cache")
+
+        # Cosmos DB setup (blocking SDK round-trips) runs in a worker thread while the agent and plugins initialize
+        store_future = asyncio.ensure_future(asyncio.to_thread(CosmosConversationStore.from_env, cache=cache))
+
+        kernel, agent, plugins = await initialize_agent_and_plugins(cache=cache)
 
         app.state.kernel = kernel or None
         app.state.agent = agent or None
         app.state.plugins = plugins or None
+        app.state.model_router = create_model_router(kernel, agent, plugins)
 
-        cosmos_endpoint = os.environ.get("COSMOS_ENDPOINT")
-        cosmos_key = os.environ.get("COSMOS_KEY")
-        cosmos_db = os.environ.get("COSMOS_DB", "agent_db")
-        cosmos_container = os.environ.get("COSMOS_CONTAINER", "conversations")
-
-        if CosmosConversationStore and cosmos_endpoint and cosmos_key:
-            try:
-                store = CosmosConversationStore(
-                    cosmos_endpoint,
-                    cosmos_key if cosmos_key else None,
-                    cosmos_db,
-                    cosmos_container
-                )
+        try:
+            store = await store_future
+            if store is not None:
                 app.state.conversation_store = store
                 logger.info("Cosmos conversation store initialized and stored on app.state")
 
-            except Exception:
-                logger.exception("Failed to initialize Cosmos conversation store")
+                # Feedback is buffered in memory and flushed in bulk by a background task
+                app.state.feedback_buffer = FeedbackBuffer(store.container)
+                app.state.feedback_task = asyncio.create_task(app.state.feedback_buffer.run())
+
+                # Background compaction of idle sessions (disabled unless COMPACTION_INTERVAL_SECONDS > 0)
+                if COMPACTION_INTERVAL_SECONDS > 0:
+                    app.state.compaction_task = asyncio.create_task(run_compaction_loop(store))
+
+        except Exception:
+            logger.exception("Failed to initialize Cosmos conversation store")
+
+        app.state.startup = {
+            "importSeconds": round(IMPORT_SECONDS, 3),
+            "initSeconds": round(time.perf_counter() - init_started, 3),
+        }
+        logger.info("Agent and plugins initialized and stored on app.state (%s)", app.state.startup)
 
-        logger.info("Agent and plugins initialized and stored on app.state")
-        
         yield
 
     finally:
+        # Cancelling the feedback task performs a final flush of buffered ratings.
+        for task_name in ("compaction_task", "feedback_task", "import_audit_task"):
+            task = getattr(app.state, task_name, None)
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
         try:
             await shutdown_plugins(getattr(app.state, "plugins", None))
         except Exception:
@@ -79,13 +123,35 @@ async def health_check():
     return {"status": "healthy"}
 
 
-# Set middleware to intercept requests and include process time in response header 
+# Process-local counters (routing, cancellations, caches, ...)
+@app.get("/metrics", response_class=JSONResponse)
+async def get_metrics():
+    return {"counters": metrics.get_counters(), "startup": getattr(app.state, "startup", None)}
+
+
+# Instance identifier used as a session affinity hint (matches the App Service ARRAffinity cookie value).
+INSTANCE_ID = os.getenv("WEBSITE_INSTANCE_ID") or os.getenv("HOSTNAME") or socket.gethostname()
+app.state.instance_id = INSTANCE_ID  # Sent on WebSocket handshakes, which bypass the HTTP middleware
+
+
+# Set middleware to intercept requests and include process time and affinity hint in response headers.
+# Requests selected for profiling (X-Profile header or PROFILE_SAMPLE_RATE) are sampled while they run.
 @app.middleware("http")
 async def add_process_time_header(request, call_next):
     start_time = time.time()
-    response = await call_next(request)
+    profile = start_request_profile(request)
+    status_code = None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        if profile is not None:
+            finish_request_profile(profile, time.time() - start_time, status_code)
     process_time = time.time() - start_time
     response.headers["X-Process-Time"] = str(f'{process_time:0.4f} sec')
+    response.headers["X-Session-Affinity"] = INSTANCE_ID
+    if profile is not None:
+        response.headers["X-Profile-Id"] = profile.id
     return response
 
 
@@ -107,6 +173,10 @@ async def validation_exception_handler(request, err):
 
 # Add API routes and prefix
 app.include_router(chat_router)
+app.include_router(ws_router)
+app.include_router(sessions_router)
+app.include_router(feedback_router)
+app.include_router(debug_router)
 
 # Run the app with Uvicorn if executed directly
 if __name__ == "__main__":
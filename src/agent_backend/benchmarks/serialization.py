@@ -0,0 +1,121 @@
+"""Serialization microbenchmarks for /chat responses with large `usedTools` traces.
+
+Compares the validated response path against the trusted `model_construct`
+path, and the frontend proxy's decode/re-encode against byte pass-through.
+Run from the backend directory:
+
+    python benchmarks/serialization.py --sizes 10 1000 20000
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+from typing import Callable, List, Optional
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from schemas.chat import ChatResponse, TokenUsage  # noqa: E402
+from services.serialization import dumps, orjson  # noqa: E402
+
+
+def _payload(tools: int) -> dict:
+    used_tools = [
+        f'MicrosoftLearn.microsoft_docs_search.{{"query": "azure container apps scale rule {i} for http traffic"}}'
+        for i in range(tools)
+    ]
+    return {
+        "sessionId": "bench-session",
+        "answer": "Azure Container Apps scale on HTTP concurrency. " * 40,
+        "usedTools": used_tools,
+        "usage": {"prompt_tokens": 1843, "completion_tokens": 412, "total_tokens": 2255},
+        "modelTier": "large",
+        "responseId": "4b7c2f0e-8a51-4d3b-9a7e-2f1e6c0d9b11",
+    }
+
+
+def validated_path(p: dict) -> bytes:
+    """Previous path: validated models, re-validated against response_model, then json.dumps."""
+    response = ChatResponse(sessionId=p["sessionId"], answer=p["answer"], usedTools=p["usedTools"],
+                            tokenUsage=TokenUsage(**p["usage"]), modelTier=p["modelTier"],
+                            responseId=p["responseId"])
+    revalidated = ChatResponse.model_validate(response.model_dump())
+    return json.dumps(revalidated.model_dump()).encode("utf-8")
+
+
+def _constructed(p: dict) -> ChatResponse:
+    return ChatResponse.model_construct(sessionId=p["sessionId"], answer=p["answer"], usedTools=p["usedTools"],
+                                        tokenUsage=TokenUsage.model_construct(**p["usage"]),
+                                        modelTier=p["modelTier"], responseId=p["responseId"])
+
+
+def constructed_model_dump_json(p: dict) -> bytes:
+    """model_construct + pydantic-core model_dump_json (model_response without orjson)."""
+    return _constructed(p).model_dump_json().encode("utf-8")
+
+
+def constructed_dumps(p: dict) -> bytes:
+    """model_construct + orjson over model_dump (model_response with orjson)."""
+    return dumps(_constructed(p).model_dump())
+
+
+def proxy_reencode(body: bytes) -> bytes:
+    """Previous frontend proxy: parse the backend body, remap fields, re-encode for the browser."""
+    data = json.loads(body)
+    response_data = {
+        "agent_response": data.get("answer", ""),
+        "response_id": data.get("responseId") or data.get("sessionId"),
+        "used_tools": data.get("usedTools") or [],
+    }
+    if data.get("tokenUsage"):
+        response_data["tokenUsage"] = data["tokenUsage"]
+    if data.get("modelTier"):
+        response_data["model_tier"] = data["modelTier"]
+    return json.dumps(response_data).encode("utf-8")
+
+
+def proxy_passthrough(body: bytes) -> bytes:
+    """Current frontend proxy: the backend bytes are returned as-is."""
+    return body
+
+
+def _time(fn: Callable, arg, repeat: int) -> float:
+    """Best-of-`repeat` seconds per call."""
+    timer = timeit.Timer(lambda: fn(arg))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmark /chat response serialization.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 20000], help="usedTools list lengths")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = parser.parse_args(argv)
+
+    print(f"orjson: {'available' if orjson is not None else 'not installed (stdlib json fallback)'}")
+    print(f"{'usedTools':>10} {'bytes':>10}  {'case':<38} {'us/call':>10} {'speedup':>8}")
+
+    for size in args.sizes:
+        p = _payload(size)
+        body = constructed_model_dump_json(p)
+        groups = [
+            [("backend: validated + json.dumps", validated_path, p),
+             ("backend: model_construct + dump_json", constructed_model_dump_json, p),
+             ("backend: model_construct + dumps", constructed_dumps, p)],
+            [("frontend: decode + re-encode", proxy_reencode, body),
+             ("frontend: byte pass-through", proxy_passthrough, body)],
+        ]
+        for group in groups:
+            baseline = None
+            for name, fn, arg in group:
+                seconds = _time(fn, arg, args.repeat)
+                baseline = baseline or seconds
+                print(f"{size:>10} {len(body):>10}  {name:<38} {seconds * 1e6:>10.1f} {baseline / seconds:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Startup benchmark: time from process (or container) launch to the first healthy `/ping`.
+
+Run from the backend directory:
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --url http://localhost:8000/ping \\
+        --command "docker run --rm -p 8000:8000 --env-file .env agent-backend"
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+from typing import List, Optional
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_healthy(url: str, timeout: float, proc: subprocess.Popen, poll_interval: float = 0.05) -> Optional[float]:
+    """Poll `url` until it answers 200; returns the elapsed seconds, or None on timeout/process exit."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1.0) as resp:
+                if resp.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(poll_interval)
+    return None
+
+
+def measure_once(command: List[str], url: str, timeout: float) -> Optional[float]:
+    proc = subprocess.Popen(command, cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return wait_healthy(url, timeout, proc)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def measure_import(runs: int) -> List[float]:
+    """Time a bare `import app` in a fresh interpreter (no lifespan, no network)."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app"], cwd=APP_DIR, check=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _summary(timings: List[float]) -> dict:
+    return {
+        "runs": len(timings),
+        "min": round(min(timings), 3),
+        "median": round(statistics.median(timings), 3),
+        "max": round(max(timings), 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure time-to-first-healthy-ping of the agent backend.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of cold starts to measure")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the locally started uvicorn server")
+    parser.add_argument("--url", default=None, help="Health URL to poll (default: http://127.0.0.1:<port>/ping)")
+    parser.add_argument("--command", default=None, help="Command starting the server (default: uvicorn app:app)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for a healthy ping")
+    parser.add_argument("--import-only", action="store_true", help="Only time `import app` in a fresh interpreter")
+    args = parser.parse_args(argv)
+
+    if args.import_only:
+        print(json.dumps({"importSeconds": _summary(measure_import(args.runs))}, indent=2))
+        return 0
+
+    url = args.url or f"http://127.0.0.1:{args.port}/ping"
+    command = shlex.split(args.command) if args.command else [
+        sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(args.port), "--app-dir", "."
+    ]
+
+    timings, failures = [], 0
+    for i in range(args.runs):
+        elapsed = measure_once(command, url, args.timeout)
+        if elapsed is None:
+            failures += 1
+            print(f"run {i + 1}: not healthy within {args.timeout}s", file=sys.stderr)
+        else:
+            timings.append(elapsed)
+            print(f"run {i + 1}: healthy after {elapsed:.3f}s", file=sys.stderr)
+
+    result = {"timeToHealthySeconds": _summary(timings) if timings else None, "failures": failures}
+    print(json.dumps(result, indent=2))
+    return 0 if timings else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,8 @@
 import os
 
 from contextlib import asynccontextmanager
-from dotenv import load_dotenv
 from semantic_kernel.connectors.mcp import MCPStreamableHttpPlugin
 
-load_dotenv()
-
 
 @asynccontextmanager
 async def microsoft_learn_mcp_plugin(url: str | None = None, headers: dict | None = None):
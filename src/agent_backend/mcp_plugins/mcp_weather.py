@@ -4,15 +4,12 @@ import random
 import asyncio
 
 from contextlib import asynccontextmanager
-from dotenv import load_dotenv
 from datetime import datetime, timezone
 
 from semantic_kernel.connectors.mcp import MCPStdioPlugin
 from semantic_kernel.connectors.mcp import create_mcp_server_from_functions
 from semantic_kernel.functions import kernel_function
 
-load_dotenv()
-
 
 class WeatherPlugin:
     @kernel_function(description="Return weather for a single city. Provide city as a string parameter.")
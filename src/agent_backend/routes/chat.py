@@ -1,7 +1,16 @@
+import asyncio
+
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Request
-from schemas.chat import ChatRequest, ChatResponse, TokenUsage
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from schemas.chat import ChatRequest, ChatResponse, TokenUsage, BatchChatRequest
 from services.tool_tracker import set_current_used_tools
 from services.agent import ask_agent_with_memory
+from services.cancellation import cancel_on_disconnect
+from services.batch import run_chat_batch, parse_jsonl_requests, MAX_BATCH_ITEMS
+from services.serialization import model_response
 
 
 router = APIRouter()
@@ -19,30 +28,88 @@ async def chat_endpoint(req: ChatRequest, request: Request):
 
     # Short-circuit if the user prompt is empty/whitespace-only to avoid unnecessary agent call.
     if not question or not question.strip():
-        return ChatResponse(sessionId=session_id, answer="", usedTools=[])
+        return model_response(ChatResponse.model_construct(sessionId=session_id, answer="", usedTools=[]))
 
     # Conversation memory backed by Cosmos DB
     store = getattr(request.app.state, "conversation_store", None)
     if store is None:
         raise HTTPException(status_code=503, detail="Conversation store not configured")
 
-    mem = store.get_memory(session_id, max_items=5)
+    # History load (Cosmos DB / cache) is blocking; keep it off the event loop.
+    mem = await asyncio.to_thread(store.get_memory, session_id, 5)
 
     used_tools_list: list[str] = []
     set_current_used_tools(used_tools_list)
 
-    answer, token_usage = await ask_agent_with_memory(agent, mem, question, used_tools_list, user_name)
-
-    set_current_used_tools(None)
+    router = getattr(request.app.state, "model_router", None)
+    try:
+        # Abort the agent invocation (and skip persisting the turn) if the client goes away.
+        answer, token_usage, model_tier = await cancel_on_disconnect(
+            request, ask_agent_with_memory(agent, mem, question, used_tools_list, user_name, router=router)
+        )
+    finally:
+        set_current_used_tools(None)
 
     # Create TokenUsage object if we have token usage information
     token_usage_obj = None
     if token_usage:
-        token_usage_obj = TokenUsage(**token_usage)
+        token_usage_obj = TokenUsage.model_construct(**token_usage)
 
-    return ChatResponse(
+    # Built from trusted internal values: skip validation (the tool trace can be large).
+    return model_response(ChatResponse.model_construct(
         sessionId=session_id, 
         answer=answer, 
         usedTools=used_tools_list,
-        tokenUsage=token_usage_obj
-    )
+        tokenUsage=token_usage_obj,
+        modelTier=model_tier,
+        responseId=mem.last_message_id
+    ))
+
+
+@router.post("/chat/batch")
+async def chat_batch_endpoint(request: Request, concurrency: Optional[int] = None, persist_memory: bool = True):
+    """Run many chat requests and stream NDJSON results as they complete.
+
+    Accepts either a JSON `BatchChatRequest` body or a JSONL upload
+    (`Content-Type: application/x-ndjson` or `application/jsonl`) with one
+    `ChatRequest` per line; for JSONL, options come from the query string. Options
+    omitted from a JSON body fall back to the query string.
+    """
+    agent = getattr(request.app.state, "agent", None)
+
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent not ready")
+
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            requests = parse_jsonl_requests(body)
+        else:
+            batch = BatchChatRequest.model_validate_json(body)
+            requests = batch.requests
+            concurrency = batch.concurrency or concurrency
+            persist_memory = batch.persistMemory if batch.persistMemory is not None else persist_memory
+    except (ValueError, ValidationError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    if len(requests) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_ITEMS} requests")
+
+    store = getattr(request.app.state, "conversation_store", None)
+    if persist_memory and store is None:
+        raise HTTPException(status_code=503, detail="Conversation store not configured")
+
+    async def _stream():
+        async for line in run_chat_batch(
+            agent,
+            requests,
+            store=store,
+            concurrency=concurrency,
+            persist_memory=persist_memory,
+            router=getattr(request.app.state, "model_router", None)
+        ):
+            yield line.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
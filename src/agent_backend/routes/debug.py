@@ -0,0 +1,39 @@
+import os
+import hmac
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from services.profiling import slowest_profiles
+
+
+# Shared secret for the debug and session history endpoints; they are not served at all when unset.
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN")
+
+router = APIRouter()
+
+
+def require_debug_token(token: Optional[str]) -> None:
+    """Reject the request unless `token` matches DEBUG_TOKEN (404 when no token is configured)."""
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token.encode("utf-8"), DEBUG_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+@router.get("/debug/profiles", response_class=JSONResponse)
+async def list_profiles(x_debug_token: Optional[str] = Header(default=None)):
+    """List the slowest captured request profiles (slowest first)."""
+    require_debug_token(x_debug_token)
+    return {"profiles": [p.summary() for p in slowest_profiles.list()]}
+
+
+@router.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, x_debug_token: Optional[str] = Header(default=None)):
+    """Return one profile as collapsed stacks (input for flamegraph.pl or speedscope)."""
+    require_debug_token(x_debug_token)
+    profile = slowest_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(content=profile.collapsed())
@@ -0,0 +1,31 @@
+import asyncio
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from schemas.chat import FeedbackRequest
+
+
+router = APIRouter()
+
+
+def _get_buffer(request: Request):
+    buffer = getattr(request.app.state, "feedback_buffer", None)
+    if buffer is None:
+        raise HTTPException(status_code=503, detail="Conversation store not configured")
+    return buffer
+
+
+@router.post("/feedback", status_code=202, response_class=JSONResponse)
+async def feedback_endpoint(req: FeedbackRequest, request: Request):
+    """Accept a thumbs-up/down rating; it is buffered and persisted in bulk, never inline."""
+    if not _get_buffer(request).add(req.sessionId, req.responseId, req.rating):
+        raise HTTPException(status_code=503, detail="Feedback buffer full, retry later")
+    return {"status": "accepted"}
+
+
+@router.get("/feedback/stats", response_class=JSONResponse)
+async def feedback_stats(request: Request, session_id: Optional[str] = None):
+    """Return aggregate (and optionally per-session) satisfaction counters derived from Cosmos."""
+    return await asyncio.to_thread(_get_buffer(request).stats, session_id)
@@ -0,0 +1,94 @@
+import base64
+import asyncio
+import binascii
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from schemas.chat import MessagesPage
+from routes.debug import require_debug_token
+from services.conversation_store import MESSAGE_FIELDS
+from services.serialization import dumps, model_response
+
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 500
+
+
+def _get_store(request: Request):
+    store = getattr(request.app.state, "conversation_store", None)
+    if store is None:
+        raise HTTPException(status_code=503, detail="Conversation store not configured")
+    return store
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[list[str]]:
+    """Parse a comma-separated projection, rejecting unknown fields."""
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in MESSAGE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(MESSAGE_FIELDS)}")
+    return selected
+
+
+# Cosmos continuation tokens are JSON; wrap them in URL-safe base64 so they can travel as query params.
+def _encode_token(token: Optional[str]) -> Optional[str]:
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii") if token else None
+
+
+def _decode_token(token: Optional[str]) -> Optional[str]:
+    if not token:
+        return None
+    try:
+        return base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=422, detail="Invalid continuation token")
+
+
+@router.get("/sessions/{session_id}/messages", response_model=MessagesPage, response_model_exclude_none=True)
+async def list_session_messages(
+    session_id: str,
+    request: Request,
+    page_size: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    continuation: Optional[str] = None,
+    fields: Optional[str] = None,
+    x_debug_token: Optional[str] = Header(default=None)
+):
+    """Return one page of a session's messages in chronological order."""
+    require_debug_token(x_debug_token)
+    store = _get_store(request)
+
+    # The Cosmos SDK is synchronous; keep the event loop free while the page is fetched.
+    items, token = await asyncio.to_thread(
+        store.query_messages_page, session_id, page_size, _decode_token(continuation), _parse_fields(fields)
+    )
+    # Items come straight from the store: skip validating every message document.
+    page = MessagesPage.model_construct(sessionId=session_id, messages=items, continuationToken=_encode_token(token))
+    return model_response(page, exclude_none=True)
+
+
+@router.get("/sessions/{session_id}/export")
+async def export_session_messages(
+    session_id: str,
+    request: Request,
+    page_size: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    x_debug_token: Optional[str] = Header(default=None)
+):
+    """Stream all of a session's messages as NDJSON, one page in memory at a time."""
+    require_debug_token(x_debug_token)
+    store = _get_store(request)
+    pages = store.iter_message_pages(session_id, page_size, _parse_fields(fields))
+
+    async def _stream():
+        while True:
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                break
+            yield b"".join(dumps(item) + b"\n" for item in page)
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
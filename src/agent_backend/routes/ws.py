@@ -0,0 +1,148 @@
+import json
+import asyncio
+import logging
+
+from typing import Dict, Set
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from schemas.chat import WsChatFrame
+from services.tool_tracker import set_current_used_tools, set_current_tool_listener
+from services.agent import stream_agent_with_memory
+from services import metrics
+from services.serialization import dumps
+
+
+router = APIRouter()
+
+logger = logging.getLogger("backend.app.routes.ws")
+
+
+@router.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Multiplexed chat transport, one connection per browser tab.
+
+    Client frames (JSON):
+        {"type": "chat", "requestId", "sessionId", "chatInput", "userName"?}
+        {"type": "cancel", "requestId"}
+        {"type": "ping"}
+
+    Server frames (JSON), each tagged with the originating requestId/sessionId:
+        token, tool, done, cancelled, error, pong
+
+    Several turns (typically for different sessions) may be in flight at once;
+    a session only runs one turn at a time. Cancelling a turn, or closing the
+    socket, aborts its in-flight agent invocation without persisting it; cancels
+    arriving once the answer is complete (while it is persisted) are ignored and
+    the turn ends with `done`.
+    """
+    instance_id = getattr(websocket.app.state, "instance_id", None)
+    await websocket.accept(headers=[(b"x-session-affinity", instance_id.encode())] if instance_id else None)
+
+    agent = getattr(websocket.app.state, "agent", None)
+    store = getattr(websocket.app.state, "conversation_store", None)
+    model_router = getattr(websocket.app.state, "model_router", None)
+
+    # All frames go through one queue/sender so concurrent turns never interleave writes.
+    outbound: asyncio.Queue = asyncio.Queue()
+    turns: Dict[str, asyncio.Task] = {}
+    active_sessions: Dict[str, str] = {}
+    completing: Set[str] = set()  # Turns whose answer is complete and being persisted
+
+    async def _sender() -> None:
+        while True:
+            frame = await outbound.get()
+            await websocket.send_text(dumps(frame).decode("utf-8"))
+
+    def _send(frame: dict) -> None:
+        outbound.put_nowait(frame)
+
+    async def _run_turn(frame: WsChatFrame) -> None:
+        tags = {"requestId": frame.requestId, "sessionId": frame.sessionId}
+        used_tools: list[str] = []
+        set_current_used_tools(used_tools)
+        set_current_tool_listener(lambda entry: _send({"type": "tool", "tool": entry, **tags}))
+
+        try:
+            if agent is None:
+                raise HTTPException(status_code=503, detail="Agent not ready")
+            if store is None:
+                raise HTTPException(status_code=503, detail="Conversation store not configured")
+
+            mem = await asyncio.to_thread(store.get_memory, frame.sessionId, 5)
+
+            async for event in stream_agent_with_memory(
+                agent, mem, frame.chatInput, used_tools, frame.userName, router=model_router,
+                on_complete=lambda: completing.add(frame.requestId)
+            ):
+                if event["type"] == "done":
+                    event = {**event, "usedTools": used_tools, "responseId": mem.last_message_id}
+                _send({**event, **tags})
+
+        except asyncio.CancelledError:
+            metrics.increment("requests.cancelled.ws")
+            _send({"type": "cancelled", **tags})
+            raise
+        except HTTPException as exc:
+            _send({"type": "error", "status": exc.status_code, "detail": str(exc.detail), **tags})
+        except Exception as exc:
+            logger.exception("WebSocket turn %s failed", frame.requestId)
+            _send({"type": "error", "status": 500, "detail": str(exc), **tags})
+        finally:
+            set_current_tool_listener(None)
+            set_current_used_tools(None)
+            turns.pop(frame.requestId, None)
+            completing.discard(frame.requestId)
+            active_sessions.pop(frame.sessionId, None)
+
+    sender = asyncio.create_task(_sender())
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except ValueError:
+                _send({"type": "error", "status": 400, "detail": "Frames must be JSON objects"})
+                continue
+            frame_type = data.get("type") if isinstance(data, dict) else None
+
+            if frame_type == "ping":
+                _send({"type": "pong"})
+
+            elif frame_type == "cancel":
+                request_id = data.get("requestId")
+                task = turns.get(request_id)
+                if task is not None and request_id not in completing:
+                    task.cancel()
+
+            elif frame_type == "chat":
+                try:
+                    frame = WsChatFrame.model_validate(data)
+                except ValidationError as exc:
+                    _send({"type": "error", "requestId": data.get("requestId"), "status": 422, "detail": str(exc)})
+                    continue
+
+                if not frame.chatInput.strip():
+                    _send({"type": "done", "requestId": frame.requestId, "sessionId": frame.sessionId,
+                           "answer": "", "usedTools": []})
+                elif frame.requestId in turns or frame.sessionId in active_sessions:
+                    _send({"type": "error", "requestId": frame.requestId, "sessionId": frame.sessionId,
+                           "status": 409, "detail": "A turn is already in flight for this request or session"})
+                else:
+                    active_sessions[frame.sessionId] = frame.requestId
+                    turns[frame.requestId] = asyncio.create_task(_run_turn(frame))
+
+            else:
+                _send({"type": "error", "status": 400, "detail": f"Unsupported frame type: {frame_type}"})
+
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        logger.exception("WebSocket connection failed")
+    finally:
+        # Abort in-flight turns so model capacity is freed when the tab goes away.
+        pending = list(turns.values())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 
@@ -22,3 +22,67 @@ class ChatResponse(BaseModel):
     answer: str
     usedTools: list[str]
     tokenUsage: Optional[TokenUsage] = None
+    modelTier: Optional[str] = None  # Model tier that served the turn when routing is enabled
+    responseId: Optional[str] = None  # Id of the persisted assistant message, used for feedback
+
+
+class BatchChatRequest(BaseModel):
+    """Request body for the /chat/batch endpoint."""
+    requests: list[ChatRequest]
+    concurrency: Optional[int] = None  # Max in-flight agent calls (defaults to BATCH_CHAT_CONCURRENCY)
+    persistMemory: Optional[bool] = None  # When False, turns neither load nor persist Cosmos history (defaults to the query value)
+
+
+class BatchChatResult(BaseModel):
+    """Single NDJSON result line streamed by the /chat/batch endpoint."""
+    type: str = "result"
+    index: int
+    sessionId: str
+    status: int = 200
+    answer: Optional[str] = None
+    usedTools: list[str] = []
+    tokenUsage: Optional[TokenUsage] = None
+    modelTier: Optional[str] = None
+    latencyMs: float
+    error: Optional[str] = None
+
+
+class BatchChatSummary(BaseModel):
+    """Final NDJSON summary line streamed by the /chat/batch endpoint."""
+    type: str = "summary"
+    total: int
+    succeeded: int
+    failed: int
+    tokenUsage: TokenUsage
+    latencyMsAvg: float
+    latencyMsP50: float
+    latencyMsP95: float
+    latencyMsMax: float
+    wallTimeMs: float
+
+
+class WsChatFrame(BaseModel):
+    """Client `chat` frame on the /ws/chat WebSocket."""
+    type: str = "chat"
+    requestId: str  # Client-generated id used to correlate server frames and cancel the turn
+    sessionId: str
+    chatInput: str
+    userName: Optional[str] = None
+
+
+class MessagesPage(BaseModel):
+    """Response returned by the /sessions/{session_id}/messages endpoint."""
+    sessionId: str
+    messages: list[dict]
+    continuationToken: Optional[str] = None  # Pass back as `continuation` to fetch the next page
+
+
+# Ids that are safe inside a Cosmos document id (no '/', '\', '?', '#', bounded length).
+SAFE_ID_PATTERN = r"^[A-Za-z0-9_-]+$"
+
+
+class FeedbackRequest(BaseModel):
+    """Request body for the /feedback endpoint."""
+    sessionId: str = Field(min_length=1, max_length=128)
+    responseId: str = Field(min_length=1, max_length=128, pattern=SAFE_ID_PATTERN)  # Becomes `feedback-{responseId}`
+    rating: int = Field(ge=0, le=1)  # 1 = thumbs up, 0 = thumbs down
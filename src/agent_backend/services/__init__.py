@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Load .env once for every entry point (app, batch CLI) before service modules read their settings.
+load_dotenv()
@@ -1,7 +1,9 @@
+import os
 import asyncio
+import json
 import logging
 
-from typing import Any, List, Tuple, Optional
+from typing import Any, AsyncIterator, Callable, List, Tuple, Optional
 
 from fastapi import HTTPException
 from semantic_kernel.agents import ChatCompletionAgent
@@ -12,8 +14,12 @@ from semantic_kernel.contents.utils.author_role import AuthorRole
 from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
 from semantic_kernel.connectors.ai import FunctionChoiceBehavior
 
-from services.kernel import create_kernel
+from services.kernel import create_kernel, LARGE_SERVICE_ID, SMALL_SERVICE_ID
+from services import metrics
+from services.model_router import ModelRouter
 from services.tool_tracker import install_wrappers
+from services.cache import install_tool_cache
+from services.speculative import install_learn_prefetch, start_learn_prefetch, finish_learn_prefetch
 from mcp_plugins.mcp_microsoft_learn import microsoft_learn_mcp_plugin
 from mcp_plugins.mcp_weather import weather_mcp_plugin
 
@@ -24,12 +30,16 @@ AGENT_INSTRUCTIONS = """
     When calling a tool, summarize the response concisely.
     """.strip()
 
+# Deterministic documentation lookups whose results may be shared across requests and workers.
+DEFAULT_CACHED_TOOLS = "microsoft_docs_search,microsoft_docs_fetch"
+
 
 # Initialize kernel, plugins and create the ChatCompletionAgent.
-async def initialize_agent_and_plugins() -> Tuple[object, ChatCompletionAgent, Tuple[object, ...]]:
+async def initialize_agent_and_plugins(cache: Any = None) -> Tuple[object, ChatCompletionAgent, Tuple[object, ...]]:
     """Returns a tuple (kernel, agent, plugins_contexts).
     
     The caller is responsible for calling `shutdown_plugins(plugins_contexts)` when appropriate.
+    When a shared `cache` is given, results of the tools listed in TOOL_CACHE_TOOLS are cached.
     """
     logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     logger = logging.getLogger("backend.app.services.agent")
@@ -49,19 +59,48 @@ async def initialize_agent_and_plugins() -> Tuple[object, ChatCompletionAgent, T
         except Exception:
             logger.warning("Plugin %s connect() failed or not required", getattr(p, "name", repr(p)))
 
+    cached_tools = [t.strip() for t in os.getenv("TOOL_CACHE_TOOLS", DEFAULT_CACHED_TOOLS).split(",") if t.strip()]
+    # Session wrappers nest in install order: the tool cache and the Learn prefetch go first so the
+    # tool tracker, installed last and called first, still records calls they serve.
+    install_tool_cache(cache, *plugins, tools=cached_tools, ttl=int(os.getenv("TOOL_CACHE_TTL_SECONDS", "3600")))
+    install_learn_prefetch(learn_ctx)
     install_wrappers(*plugins)
 
-    agent = ChatCompletionAgent(
+    agent = _create_agent(kernel, plugins)
+    logger.info("Agent and plugins started")
+    return kernel, agent, plugins
+
+
+def _create_agent(kernel: Any, plugins: Tuple[object, ...], service_id: Optional[str] = None) -> ChatCompletionAgent:
+    """Create a ChatCompletionAgent, optionally bound to a specific kernel service id."""
+    settings = PromptExecutionSettings(function_choice_behavior=FunctionChoiceBehavior.Auto())
+    if service_id:
+        settings = PromptExecutionSettings(service_id=service_id, function_choice_behavior=FunctionChoiceBehavior.Auto())
+
+    return ChatCompletionAgent(
         name="SK-Agent",
         instructions=AGENT_INSTRUCTIONS,
         kernel=kernel,
         plugins=list(plugins),
-        arguments=KernelArguments(
-            PromptExecutionSettings(function_choice_behavior=FunctionChoiceBehavior.Auto())
-        )
+        arguments=KernelArguments(settings)
     )
-    logger.info("Agent and plugins started")
-    return kernel, agent, plugins
+
+
+def create_model_router(kernel: Any, agent: ChatCompletionAgent, plugins: Tuple[object, ...]) -> Optional[ModelRouter]:
+    """Return a ModelRouter when a small tier is registered on the kernel, otherwise None.
+
+    The default agent serves the large tier; a second agent sharing the same kernel
+    and plugins is bound to the small deployment.
+    """
+    services = getattr(kernel, "services", None) or {}
+    if SMALL_SERVICE_ID not in services:
+        return None
+
+    agents = {
+        LARGE_SERVICE_ID: agent,
+        SMALL_SERVICE_ID: _create_agent(kernel, plugins, service_id=SMALL_SERVICE_ID),
+    }
+    return ModelRouter.from_env(agents)
 
 
 async def shutdown_plugins(plugins):
@@ -74,107 +113,222 @@ async def shutdown_plugins(plugins):
             pass
 
 
+# Extract a token usage dict from a response item's metadata, if present.
+def _usage_from_item(item: Any) -> Optional[dict]:
+    if not hasattr(item, 'metadata') or not item.metadata:
+        return None
+    usage_data = item.metadata.get('usage')
+    if not usage_data:
+        return None
+    return {
+        'prompt_tokens': getattr(usage_data, 'prompt_tokens', 0),
+        'completion_tokens': getattr(usage_data, 'completion_tokens', 0),
+        'total_tokens': getattr(usage_data, 'prompt_tokens', 0) + getattr(usage_data, 'completion_tokens', 0)
+    }
+
+
+# Invoke the agent over a message list and return the combined answer string and token usage.
+async def _invoke_agent(agent: ChatCompletionAgent, messages: List[str | ChatMessageContent]) -> tuple[str, Optional[dict]]:
+    parts: List[str] = []
+    token_usage = None
+
+    async for item in agent.invoke(messages):
+        try:
+            parts.append(str(item).strip())
+
+            # Extract token usage from the first response item
+            if token_usage is None:
+                token_usage = _usage_from_item(item)
+        except Exception:
+            # Fallback representation for non-stringable parts
+            parts.append(repr(item))
+
+    return "\n".join(p for p in parts if p), token_usage
+
+
+def _merge_token_usage(first: Optional[dict], second: Optional[dict]) -> Optional[dict]:
+    """Sum two token usage dicts (either may be None)."""
+    if not first or not second:
+        return first or second
+    return {k: first.get(k, 0) + second.get(k, 0) for k in ('prompt_tokens', 'completion_tokens', 'total_tokens')}
+
+
+# Build the message list for a turn from conversation memory plus the new user message.
+def _build_messages(memory: Any, question: str, user_name: Optional[str] = None) -> List[str | ChatMessageContent]:
+    # Use ChatHistory rendering when the memory wrapper exposes it.
+    messages: List[str | ChatMessageContent] = list()
+    try:
+        if hasattr(memory, "chat_history") and memory.chat_history is not None:
+            chat_history: ChatHistory = memory.chat_history
+            messages = list(chat_history.messages)
+    except Exception:
+        logging.exception("Failed retrieving chat history")
+
+    messages.append(ChatMessageContent(role=AuthorRole.USER, content=question, name=user_name))
+    return messages
+
+
+# Persist a completed turn (user question + assistant answer) in conversation memory.
+# Synchronous (Cosmos SDK and cache writes); callers run it in a worker thread.
+def _persist_turn(memory: Any, question: str, answer: str, used_tools: List[str],
+                  user_name: Optional[str] = None, model_tier: Optional[str] = None) -> None:
+    try:
+        # Use the modern conversation store methods with optional user name
+        memory.add_user_message(question, name=user_name)
+        memory.add_assistant_message(answer, metadata={"modelTier": model_tier} if model_tier else None,
+                                     used_tools=used_tools)
+    except Exception:
+        logging.exception("Failed storing answer in memory")
+
+
 # Compose a prompt including conversation memory and return the combined answer string.
-async def ask_agent_with_memory(agent: ChatCompletionAgent, memory: Any, question: str, used_tools: List[str], user_name: Optional[str] = None) -> tuple[str, Optional[dict]]:
-    """Invoke the agent streaming its response, persist in memory, return answer and token usage.
+async def ask_agent_with_memory(agent: ChatCompletionAgent, memory: Any, question: str, used_tools: List[str],
+                                user_name: Optional[str] = None,
+                                router: Optional[ModelRouter] = None) -> tuple[str, Optional[dict], Optional[str]]:
+    """Invoke the agent, persist the turn in memory, return answer, token usage and model tier.
 
     Args:
-        agent: The AI agent instance
+        agent: The AI agent instance (used as-is when no router is given)
         memory: Conversation memory store
         question: User's question/input
         used_tools: List to track tools used during response
         user_name: Optional name of the user asking the question
+        router: Optional ModelRouter selecting the model tier for this turn
 
     Returns:
-        Tuple of (answer_string, token_usage_dict)
+        Tuple of (answer_string, token_usage_dict, model_tier)
 
     Raises:
         HTTPException: On agent invocation failure with appropriate status code and detail
     """
-    import json
+    messages = _build_messages(memory, question, user_name)
+
+    model_tier = None
+    if router is not None:
+        decision = router.route(question, history_depth=len(messages) - 1)
+        model_tier = decision.tier
+        agent = router.agent_for(model_tier)
+
+    # Overlap a speculative Learn search with the first model hop (no-op unless enabled).
+    prefetch = start_learn_prefetch(question)
 
-    # Use ChatHistory rendering when the memory wrapper exposes it.
     try:
-        messages: List[str | ChatMessageContent] = list()
-        if hasattr(memory, "chat_history") and memory.chat_history is not None:
-            chat_history: ChatHistory = memory.chat_history
-            messages = list(chat_history.messages)
-        
-        messages.append(ChatMessageContent(role=AuthorRole.USER, content=question, name=user_name))
-    except Exception:
-        logging.exception("Failed retrieving chat history")
+        answer, token_usage = await _invoke_agent(agent, messages)
+
+        # Retry once on the large tier when the small tier's answer fails the confidence check.
+        if router is not None:
+            escalate_to = router.escalation_tier(model_tier, question, answer)
+            if escalate_to:
+                logging.info("Escalating turn from tier '%s' to '%s'", model_tier, escalate_to)
+                used_tools.clear()  # In place: the tool tracker records into this same list
+                answer, escalated_usage = await _invoke_agent(router.agent_for(escalate_to), messages)
+                token_usage = _merge_token_usage(token_usage, escalated_usage)
+                model_tier = escalate_to
+            metrics.increment(f"routing.served.{model_tier}")
+
+    except Exception as exc:
+        _raise_agent_error(exc)
+    finally:
+        finish_learn_prefetch(prefetch)
+
+    await asyncio.to_thread(_persist_turn, memory, question, answer, used_tools, user_name, model_tier)
+    return answer, token_usage, model_tier
+
+
+# Stream the agent's answer chunk by chunk, then persist the completed turn in memory.
+async def stream_agent_with_memory(agent: ChatCompletionAgent, memory: Any, question: str, used_tools: List[str],
+                                   user_name: Optional[str] = None,
+                                   router: Optional[ModelRouter] = None,
+                                   on_complete: Optional[Callable[[], None]] = None) -> AsyncIterator[dict]:
+    """Invoke the agent in streaming mode and yield events as they are produced.
+
+    Yields `{"type": "token", "text": ...}` for each non-empty text chunk and a
+    final `{"type": "done", "answer": ..., "tokenUsage": ..., "modelTier": ...}`.
+    Tokens are already delivered when the answer can be judged, so routed turns
+    are not escalated in streaming mode. Cancelling the consuming task aborts the
+    in-flight model/tool calls and nothing is persisted. `on_complete` is called
+    once the answer is complete, just before it is persisted: the write runs in a
+    thread and cannot be aborted, so callers should stop honouring cancels then.
+
+    Raises:
+        HTTPException: On agent invocation failure with appropriate status code and detail
+    """
+    messages = _build_messages(memory, question, user_name)
+
+    model_tier = None
+    if router is not None:
+        model_tier = router.route(question, history_depth=len(messages) - 1).tier
+        agent = router.agent_for(model_tier)
 
     parts: List[str] = []
     token_usage = None
+    prefetch = start_learn_prefetch(question)
 
     try:
-        async for item in agent.invoke(messages):
+        async for item in agent.invoke_stream(messages):
+            text = str(item)
+            if text:
+                parts.append(text)
+                yield {"type": "token", "text": text}
+
+            # Usage is reported on the final chunk(s) of a streamed completion
+            token_usage = _usage_from_item(item) or token_usage
+
+    except Exception as exc:
+        _raise_agent_error(exc)
+    finally:
+        finish_learn_prefetch(prefetch)
+
+    answer = "".join(parts).strip()
+    if model_tier:
+        metrics.increment(f"routing.served.{model_tier}")
+
+    if on_complete is not None:
+        on_complete()
+    await asyncio.to_thread(_persist_turn, memory, question, answer, used_tools, user_name, model_tier)
+    yield {"type": "done", "answer": answer, "tokenUsage": token_usage, "modelTier": model_tier}
+
+
+# Map an agent invocation failure to an HTTPException with an appropriate status code.
+def _raise_agent_error(exc: Exception) -> None:
+    error_code: str | None = "InternalError"
+    error_message: str = str(exc)
+
+    def _extract_from_dict(d: dict):
+        nonlocal error_code, error_message
+        if 'error' in d:
+            err = d['error'] or {}
+            error_code = err.get('code') or (err.get('innererror') or {}).get('code') or error_code
+            error_message = err.get('message', error_message)
+
+    for arg in getattr(exc, 'args', []):
+        if isinstance(arg, dict):
+            _extract_from_dict(arg)
+            if error_code or 'error' in arg:
+                break
+        elif isinstance(arg, str) and arg.strip().startswith('{') and arg.strip().endswith('}'):
             try:
-                parts.append(str(item).strip())
-                
-                # Extract token usage from the first response item
-                if token_usage is None and hasattr(item, 'metadata') and item.metadata:
-                    usage_data = item.metadata.get('usage')
-                    if usage_data:
-                        token_usage = {
-                            'prompt_tokens': getattr(usage_data, 'prompt_tokens', 0),
-                            'completion_tokens': getattr(usage_data, 'completion_tokens', 0),
-                            'total_tokens': getattr(usage_data, 'prompt_tokens', 0) + getattr(usage_data, 'completion_tokens', 0)
-                        }
+                data = json.loads(arg)
+                if isinstance(data, dict):
+                    _extract_from_dict(data)
+                    if error_code:
+                        break
             except Exception:
-                # Fallback representation for non-stringable parts
-                parts.append(repr(item))
+                pass  # Ignore JSON parse errors
 
-        answer = "\n".join(p for p in parts if p)
+    logging.exception("Agent invocation failed (code=%s)", error_code)
 
-        try:
-            # Use the modern conversation store methods with optional user name
-            memory.add_user_message(question, name=user_name)
-            memory.add_assistant_message(answer, used_tools=used_tools)
-        except Exception:
-            logging.exception("Failed storing answer in memory")
-            
-        return answer, token_usage
+    # Map error codes to appropriate HTTP status codes
+    status_code = 500  # Default to internal server error
+    if error_code in ["RateLimited", "ThrottledError", "429"]:
+        status_code = 429
+    elif error_code in ["Unauthorized", "401"]:
+        status_code = 401
+    elif error_code in ["Forbidden", "403"]:
+        status_code = 403
+    elif error_code in ["BadRequest", "InvalidRequest", "400"]:
+        status_code = 400
+    elif error_code in ["ServiceUnavailable", "503"]:
+        status_code = 503
 
-    except Exception as exc:
-        error_code: str | None = "InternalError"
-        error_message: str = str(exc)
-
-        def _extract_from_dict(d: dict):
-            nonlocal error_code, error_message
-            if 'error' in d:
-                err = d['error'] or {}
-                error_code = err.get('code') or (err.get('innererror') or {}).get('code') or error_code
-                error_message = err.get('message', error_message)
-
-        for arg in getattr(exc, 'args', []):
-            if isinstance(arg, dict):
-                _extract_from_dict(arg)
-                if error_code or 'error' in arg:
-                    break
-            elif isinstance(arg, str) and arg.strip().startswith('{') and arg.strip().endswith('}'):
-                try:
-                    data = json.loads(arg)
-                    if isinstance(data, dict):
-                        _extract_from_dict(data)
-                        if error_code:
-                            break
-                except Exception:
-                    pass  # Ignore JSON parse errors
-
-        logging.exception("Agent invocation failed (code=%s)", error_code)
-        
-        # Map error codes to appropriate HTTP status codes
-        status_code = 500  # Default to internal server error
-        if error_code in ["RateLimited", "ThrottledError", "429"]:
-            status_code = 429
-        elif error_code in ["Unauthorized", "401"]:
-            status_code = 401
-        elif error_code in ["Forbidden", "403"]:
-            status_code = 403
-        elif error_code in ["BadRequest", "InvalidRequest", "400"]:
-            status_code = 400
-        elif error_code in ["ServiceUnavailable", "503"]:
-            status_code = 503
-            
-        raise HTTPException(status_code=status_code, detail=error_message)
+    raise HTTPException(status_code=status_code, detail=error_message)
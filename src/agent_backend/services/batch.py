@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+from typing import Any, AsyncIterator, Iterable, List, Optional, Union
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from schemas.chat import ChatRequest, BatchChatResult, BatchChatSummary, TokenUsage
+from services.agent import ask_agent_with_memory
+from services.conversation_store import CosmosConversationMemory
+from services.tool_tracker import set_current_used_tools
+from services import metrics
+
+
+# Batch execution limits (override via environment).
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("BATCH_CHAT_CONCURRENCY", "4"))
+MAX_BATCH_CONCURRENCY = int(os.getenv("BATCH_CHAT_MAX_CONCURRENCY", "32"))
+MAX_BATCH_ITEMS = int(os.getenv("BATCH_CHAT_MAX_ITEMS", "10000"))
+
+
+def resolve_concurrency(requested: Optional[int] = None) -> int:
+    """Clamp a requested concurrency to [1, BATCH_CHAT_MAX_CONCURRENCY]."""
+    value = requested or DEFAULT_BATCH_CONCURRENCY
+    return max(1, min(value, MAX_BATCH_CONCURRENCY))
+
+
+def parse_jsonl_requests(data: Union[bytes, str]) -> List[ChatRequest]:
+    """Parse a JSONL payload (one ChatRequest per line, blank lines ignored).
+
+    Raises:
+        ValueError: When a line is not a valid ChatRequest (message includes the line number)
+    """
+    text = data.decode("utf-8") if isinstance(data, bytes) else data
+    requests: List[ChatRequest] = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            requests.append(ChatRequest.model_validate_json(line))
+        except ValidationError as exc:
+            raise ValueError(f"Invalid ChatRequest on line {line_no}: {exc.errors()[0].get('msg')}") from exc
+    return requests
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_results(results: List[BatchChatResult], wall_time_ms: float) -> BatchChatSummary:
+    """Aggregate token usage and latency statistics for a completed batch."""
+    latencies = sorted(r.latencyMs for r in results)
+    prompt_tokens = sum(r.tokenUsage.prompt_tokens for r in results if r.tokenUsage)
+    completion_tokens = sum(r.tokenUsage.completion_tokens for r in results if r.tokenUsage)
+    succeeded = sum(1 for r in results if r.error is None)
+
+    return BatchChatSummary(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        tokenUsage=TokenUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        ),
+        latencyMsAvg=round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        latencyMsP50=round(_percentile(latencies, 50), 2),
+        latencyMsP95=round(_percentile(latencies, 95), 2),
+        latencyMsMax=round(latencies[-1], 2) if latencies else 0.0,
+        wallTimeMs=round(wall_time_ms, 2)
+    )
+
+
+async def _run_one(index: int, req: ChatRequest, agent: Any, store: Any, persist_memory: bool, router: Any) -> BatchChatResult:
+    """Run a single batch item; failures are reported in the result instead of raised."""
+    start = time.perf_counter()
+    used_tools: List[str] = []
+    set_current_used_tools(used_tools)
+
+    def _result(**kwargs) -> BatchChatResult:
+        return BatchChatResult(
+            index=index,
+            sessionId=req.sessionId,
+            usedTools=used_tools,
+            latencyMs=round((time.perf_counter() - start) * 1000, 2),
+            **kwargs
+        )
+
+    try:
+        if not req.chatInput or not req.chatInput.strip():
+            return _result(answer="")
+
+        if persist_memory:
+            if store is None:
+                raise HTTPException(status_code=503, detail="Conversation store not configured")
+            mem = await asyncio.to_thread(store.get_memory, req.sessionId, 5)
+        else:
+            # Ephemeral memory: no history load and no writes for independent evaluation prompts.
+            mem = CosmosConversationMemory(None, req.sessionId, persist=False)
+
+        answer, token_usage, model_tier = await ask_agent_with_memory(
+            agent, mem, req.chatInput, used_tools, req.userName, router=router
+        )
+        return _result(
+            answer=answer,
+            tokenUsage=TokenUsage(**token_usage) if token_usage else None,
+            modelTier=model_tier
+        )
+
+    except HTTPException as exc:
+        return _result(status=exc.status_code, error=str(exc.detail))
+    except Exception as exc:
+        logging.exception("Batch item %s failed", index)
+        return _result(status=500, error=str(exc))
+    finally:
+        set_current_used_tools(None)
+
+
+async def run_chat_batch(
+    agent: Any,
+    requests: Iterable[ChatRequest],
+    store: Any = None,
+    concurrency: Optional[int] = None,
+    persist_memory: bool = True,
+    router: Any = None
+) -> AsyncIterator[Union[BatchChatResult, BatchChatSummary]]:
+    """Run many chat requests against a shared agent with bounded concurrency.
+
+    Results are yielded in completion order (each carries its input `index`),
+    followed by a single BatchChatSummary. Closing the iterator early cancels
+    the in-flight work.
+
+    Args:
+        agent: The shared ChatCompletionAgent
+        requests: Chat requests to execute
+        store: CosmosConversationStore (required when persist_memory is True)
+        concurrency: Max in-flight agent calls (see resolve_concurrency)
+        persist_memory: Load and persist Cosmos history for each turn
+        router: Optional ModelRouter
+    """
+    items = list(requests)
+    limit = resolve_concurrency(concurrency)
+    queue: asyncio.Queue = asyncio.Queue()
+    pending = iter(range(len(items)))
+    start = time.perf_counter()
+
+    async def _worker() -> None:
+        # Workers share one index iterator so at most `limit` items are in flight.
+        for i in pending:
+            queue.put_nowait(await _run_one(i, items[i], agent, store, persist_memory, router))
+
+    workers = [asyncio.create_task(_worker()) for _ in range(min(limit, len(items)))]
+    results: List[BatchChatResult] = []
+    try:
+        for _ in range(len(items)):
+            result = await queue.get()
+            results.append(result)
+            yield result
+
+        yield summarize_results(results, (time.perf_counter() - start) * 1000)
+
+    finally:
+        # Closing the iterator early (e.g. client disconnect) cancels the remaining work.
+        unfinished = len(items) - len(results)
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if unfinished:
+            metrics.increment("requests.cancelled.batch_items", unfinished)
+
+
+async def _main(argv: Optional[List[str]] = None) -> int:
+    from services.agent import initialize_agent_and_plugins, create_model_router, shutdown_plugins
+    from services.conversation_store import CosmosConversationStore
+    from services.cache import create_cache_from_env
+
+    parser = argparse.ArgumentParser(description="Run a JSONL file of ChatRequests through the agent and write NDJSON results.")
+    parser.add_argument("input", help="Path to a JSONL file of ChatRequest objects ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max in-flight agent calls")
+    parser.add_argument("--no-persist", action="store_true", help="Skip Cosmos history load and persistence")
+    args = parser.parse_args(argv)
+
+    data = sys.stdin.read() if args.input == "-" else open(args.input, encoding="utf-8").read()
+    requests = parse_jsonl_requests(data)
+
+    cache = create_cache_from_env()
+    kernel, agent, plugins = await initialize_agent_and_plugins(cache=cache)
+    try:
+        store = None if args.no_persist else CosmosConversationStore.from_env(cache=cache)
+        async for line in run_chat_batch(agent, requests, store=store, concurrency=args.concurrency,
+                                         persist_memory=not args.no_persist,
+                                         router=create_model_router(kernel, agent, plugins)):
+            sys.stdout.write(line.model_dump_json(exclude_none=True) + "\n")
+            sys.stdout.flush()
+    finally:
+        await shutdown_plugins(plugins)
+    return 0
+
+
+# Run with: python -m services.batch prompts.jsonl [--concurrency N] [--no-persist] > results.ndjson
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
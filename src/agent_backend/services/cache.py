@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional
+
+from services import metrics
+from services.serialization import dumps, loads
+
+
+# Default entry lifetime (seconds) for cached history and tool results.
+DEFAULT_CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+
+# Circuit breaker for remote caches: after this many consecutive failures, skip the cache for a while.
+CACHE_BREAKER_FAILURES = int(os.getenv("CACHE_BREAKER_FAILURES", "3"))
+CACHE_BREAKER_SECONDS = float(os.getenv("CACHE_BREAKER_SECONDS", "30"))
+
+
+class CacheBackend(ABC):
+    """Shared cache tier interface for conversation history and tool results.
+
+    Values must be JSON-serializable. List operations back the per-session
+    history window; `append_list` only extends lists that already exist so a
+    partially populated window is never mistaken for a complete one.
+
+    `shared` tells whether every worker and instance sees the same entries;
+    only shared caches may hold session history (see CosmosConversationStore).
+    """
+
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_list(self, key: str) -> Optional[List[Any]]:
+        ...
+
+    @abstractmethod
+    def set_list(self, key: str, items: Iterable[Any], max_len: int, ttl: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def append_list(self, key: str, item: Any, max_len: int, ttl: Optional[int] = None) -> None:
+        ...
+
+
+class InMemoryCache(CacheBackend):
+    """Process-local LRU cache with per-entry expiry (thread-safe).
+
+    Each worker keeps its own copy, so it only caches tool results: a local
+    history window would go stale as soon as another worker appends a turn.
+    """
+
+    def __init__(self, max_entries: int = 10000, default_ttl: int = DEFAULT_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        self._entries[key] = (time.monotonic() + (ttl or self.default_ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_list(self, key: str) -> Optional[List[Any]]:
+        with self._lock:
+            value = self._get(key)
+            # Like Redis (where empty lists don't exist), an empty window is a miss.
+            return list(value) if value else None
+
+    def set_list(self, key: str, items: Iterable[Any], max_len: int, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._set(key, list(items)[-max_len:], ttl)
+
+    def append_list(self, key: str, item: Any, max_len: int, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self._set(key, (value + [item])[-max_len:], ttl)
+
+
+class RedisCache(CacheBackend):
+    """Cache backed by any Redis-protocol server (Redis, Azure Cache for Redis, Valkey, ...).
+
+    Calls are blocking (redis-py); callers on the event loop run them in a
+    worker thread. After `breaker_failures` consecutive errors the cache fails
+    fast for `breaker_seconds`, then a single failed probe reopens the breaker.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, default_ttl: int = DEFAULT_CACHE_TTL, prefix: str = "agent:",
+                 breaker_failures: int = CACHE_BREAKER_FAILURES,
+                 breaker_seconds: float = CACHE_BREAKER_SECONDS) -> None:
+        # Imported lazily: the client is only needed for redis:// cache URLs (optional dependency).
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("redis not available")
+        self.client = redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+        self.breaker_failures = breaker_failures
+        self.breaker_seconds = breaker_seconds
+        self._failures = 0
+        self._open_until = 0.0
+        self._breaker_lock = threading.Lock()
+
+    def _call(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        """Run a Redis call through the circuit breaker."""
+        if time.monotonic() < self._open_until:
+            metrics.increment("cache.breaker.short_circuit")
+            raise RuntimeError("cache unavailable (circuit open)")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._breaker_lock:
+                self._failures += 1
+                if self._failures >= self.breaker_failures:
+                    self._open_until = time.monotonic() + self.breaker_seconds
+                    # Half-open afterwards: the next failure reopens the breaker immediately.
+                    self._failures = self.breaker_failures - 1
+                    metrics.increment("cache.breaker.opened")
+                    logging.warning("Cache unavailable; bypassing it for %ss", self.breaker_seconds)
+            raise
+        self._failures = 0
+        return result
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._call(self.client.get, self.prefix + key)
+        return loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self._call(self.client.set, self.prefix + key, dumps(value), ex=ttl or self.default_ttl)
+
+    def delete(self, key: str) -> None:
+        self._call(self.client.delete, self.prefix + key)
+
+    def get_list(self, key: str) -> Optional[List[Any]]:
+        # An empty Redis list does not exist, so empty windows are always reported as a miss.
+        raw_items = self._call(self.client.lrange, self.prefix + key, 0, -1)
+        return [loads(raw) for raw in raw_items] if raw_items else None
+
+    def set_list(self, key: str, items: Iterable[Any], max_len: int, ttl: Optional[int] = None) -> None:
+        values = [dumps(item) for item in list(items)[-max_len:]]
+        pipe = self.client.pipeline()
+        pipe.delete(self.prefix + key)
+        if values:
+            pipe.rpush(self.prefix + key, *values)
+            pipe.expire(self.prefix + key, ttl or self.default_ttl)
+        self._call(pipe.execute)
+
+    def append_list(self, key: str, item: Any, max_len: int, ttl: Optional[int] = None) -> None:
+        # RPUSHX only appends to an existing list; LTRIM keeps the window bounded.
+        pipe = self.client.pipeline()
+        pipe.rpushx(self.prefix + key, dumps(item))
+        pipe.ltrim(self.prefix + key, -max_len, -1)
+        pipe.expire(self.prefix + key, ttl or self.default_ttl)
+        self._call(pipe.execute)
+
+
+def create_cache(url: Optional[str]) -> Optional[CacheBackend]:
+    """Create a cache from a URL: `memory://` or `redis://` / `rediss://`; None when unset."""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InMemoryCache()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported cache URL scheme: {url}")
+
+
+def create_cache_from_env() -> Optional[CacheBackend]:
+    """Create the shared cache from the CACHE_URL environment variable."""
+    return create_cache(os.getenv("CACHE_URL"))
+
+
+def _tool_cache_key(plugin_name: str, tool_name: str, arguments: Any) -> str:
+    digest = hashlib.sha256(json.dumps(arguments, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"tool:{plugin_name}:{tool_name}:{digest}"
+
+
+def install_tool_cache(cache: Optional[CacheBackend], *plugins: Any, tools: Iterable[str] = (),
+                       ttl: Optional[int] = None) -> None:
+    """Cache successful MCP tool results for the named tools on each plugin's session.
+
+    Only deterministic lookups (e.g. documentation search) should be listed.
+    """
+    tool_names = set(tools)
+    if cache is None or not tool_names:
+        return
+
+    from mcp.types import CallToolResult
+
+    for plugin in plugins:
+        sess = getattr(plugin, "session", None)
+        if sess is None or not hasattr(sess, "call_tool"):
+            continue
+
+        plugin_name = getattr(plugin, "name", repr(plugin))
+        orig_call = sess.call_tool
+
+        async def cached_call(tool_name, arguments=None, *a, _orig=orig_call, _plugin=plugin_name, **kw):
+            if tool_name not in tool_names:
+                return await _orig(tool_name, arguments, *a, **kw)
+
+            key = _tool_cache_key(_plugin, tool_name, arguments)
+            try:
+                cached = await asyncio.to_thread(cache.get, key)
+                if cached is not None:
+                    metrics.increment("cache.tool.hit")
+                    return CallToolResult.model_validate(cached)
+            except Exception:
+                logging.warning("Tool result cache read failed for %s", key)
+
+            metrics.increment("cache.tool.miss")
+            result = await _orig(tool_name, arguments, *a, **kw)
+            if not getattr(result, "isError", False):
+                try:
+                    await asyncio.to_thread(cache.set, key, result.model_dump(mode="json"), ttl)
+                except Exception:
+                    logging.warning("Tool result cache write failed for %s", key)
+            return result
+
+        try:
+            setattr(sess, "call_tool", cached_call)
+        except Exception:
+            pass
+
+
+def check_cache_backend(cache: CacheBackend, prefix: str = "check:") -> None:
+    """Exercise the CacheBackend contract (values, list windows, TTLs); raises AssertionError on violations.
+
+    Used to validate a backend against a real server, e.g. a local Redis.
+    Takes about two seconds because of the expiry checks.
+    """
+    key, lst = f"{prefix}value", f"{prefix}list"
+    try:
+        cache.set(key, {"a": [1, "two", None]}, ttl=60)
+        assert cache.get(key) == {"a": [1, "two", None]}, "set/get round trip"
+        cache.delete(key)
+        assert cache.get(key) is None, "delete"
+
+        cache.delete(lst)
+        assert cache.get_list(lst) is None, "missing list is a miss"
+        cache.append_list(lst, {"n": 0}, max_len=3)
+        assert cache.get_list(lst) is None, "append_list must not create a list"
+
+        cache.set_list(lst, [{"n": i} for i in range(5)], max_len=3, ttl=60)
+        assert cache.get_list(lst) == [{"n": 2}, {"n": 3}, {"n": 4}], "set_list keeps the newest max_len items"
+        cache.append_list(lst, {"n": 5}, max_len=3)
+        assert cache.get_list(lst) == [{"n": 3}, {"n": 4}, {"n": 5}], "append_list trims to max_len"
+        cache.set_list(lst, [], max_len=3)
+        assert cache.get_list(lst) is None, "empty window is a miss"
+
+        cache.set(key, "short-lived", ttl=1)
+        cache.set_list(lst, [1, 2], max_len=3, ttl=1)
+        assert cache.get(key) == "short-lived" and cache.get_list(lst) == [1, 2], "entries readable before expiry"
+        time.sleep(2.1)
+        assert cache.get(key) is None, "value expires after its ttl"
+        assert cache.get_list(lst) is None, "list expires after its ttl"
+    finally:
+        cache.delete(key)
+        cache.delete(lst)
+
+
+# Run with: python -m services.cache [redis://localhost:6379/15]
+if __name__ == "__main__":
+    import sys
+    import uuid
+
+    backends: List[CacheBackend] = [InMemoryCache()]
+    if len(sys.argv) > 1:
+        backends.append(RedisCache(sys.argv[1], prefix=f"agent-check-{uuid.uuid4().hex[:8]}:"))
+    for backend in backends:
+        check_cache_backend(backend)
+        print(f"{type(backend).__name__}: ok")
@@ -0,0 +1,53 @@
+import os
+import asyncio
+import logging
+
+from typing import Any, Awaitable
+
+from fastapi import HTTPException, Request
+
+from services import metrics
+
+
+# How often (seconds) the client connection is checked while a request is in flight.
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# Non-standard status (nginx convention) used when the client went away before the response.
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[Any], endpoint: str = "chat",
+                               poll_interval: float | None = None) -> Any:
+    """Await `awaitable` while watching for the client to disconnect.
+
+    The work runs as a task (inheriting the caller's context, e.g. the used_tools
+    list). If the client disconnects first, the task is cancelled — aborting
+    in-flight model and tool calls before the turn is persisted — the
+    cancellation is counted under `requests.cancelled.<endpoint>` and an
+    HTTPException(499) is raised.
+    """
+    task = asyncio.ensure_future(awaitable)
+    interval = poll_interval or DISCONNECT_POLL_INTERVAL
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                metrics.increment(f"requests.cancelled.{endpoint}")
+                logging.getLogger("backend.app.services.cancellation").info(
+                    "Client disconnected; cancelled in-flight %s request", endpoint
+                )
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+
+    except asyncio.CancelledError:
+        # The handler itself was cancelled (e.g. server shutdown or ASGI disconnect): stop the work too.
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            metrics.increment(f"requests.cancelled.{endpoint}")
+        raise
@@ -0,0 +1,251 @@
+import os
+import json
+import math
+import time
+import uuid
+import socket
+import asyncio
+import datetime
+import logging
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import metrics
+from services.conversation_store import MAX_BATCH_OPERATIONS
+
+
+# Compaction settings (override via environment).
+COMPACTION_INTERVAL_SECONDS = int(os.getenv("COMPACTION_INTERVAL_SECONDS", "0"))  # 0 disables the background job
+COMPACTION_IDLE_SECONDS = int(os.getenv("COMPACTION_IDLE_SECONDS", str(7 * 24 * 3600)))
+COMPACTION_KEEP_RECENT = int(os.getenv("COMPACTION_KEEP_RECENT", "10"))
+COMPACTION_MAX_SESSIONS = int(os.getenv("COMPACTION_MAX_SESSIONS", "100"))
+COSMOS_ARCHIVE_TTL = os.getenv("COSMOS_ARCHIVE_TTL")
+
+# Each batch folds up to MAX_BATCH_OPERATIONS - 1 messages (one slot holds the archive) and stays under 2 MB.
+MAX_ARCHIVE_BYTES = 1_500_000
+
+# Lease document electing the single worker that runs compaction passes (its own partition).
+COMPACTION_LEASE_ID = "compaction-lease"
+
+# Fields kept for each message folded into an archive document (`id` is the feedback responseId).
+ARCHIVED_FIELDS = ("id", "role", "content", "name", "metadata", "ts", "usedTools")
+
+logger = logging.getLogger("backend.app.services.compaction")
+
+
+def _doc_size(doc: Dict) -> int:
+    return len(json.dumps(doc, default=str).encode("utf-8"))
+
+
+def _archive_doc(session_id: str, messages: List[Dict], archive_ttl: Optional[int]) -> Dict:
+    """Fold a chunk of message documents into a single archived summary document."""
+    doc = {
+        "id": f"archive-{uuid.uuid4()}",
+        "sessionId": session_id,
+        "type": "archive",
+        "ts": messages[-1].get("ts"),
+        "fromTs": messages[0].get("ts"),
+        "toTs": messages[-1].get("ts"),
+        "messageCount": len(messages),
+        "roles": {r: sum(1 for m in messages if m.get("role") == r) for r in {m.get("role") for m in messages}},
+        "messages": [{k: m[k] for k in ARCHIVED_FIELDS if m.get(k) not in (None, [], {})} for m in messages],
+    }
+    if archive_ttl:
+        doc["ttl"] = archive_ttl
+    return doc
+
+
+def _expires_at(item: Dict, default_ttl: Optional[int]) -> Optional[float]:
+    """Epoch seconds at which a stored document expires, or None if it never does."""
+    ttl = item.get("ttl", default_ttl)
+    if not ttl or ttl < 0 or "_ts" not in item:
+        return None
+    return item["_ts"] + ttl
+
+
+def _chunk_archive_ttl(expiries: List[Optional[float]], archive_ttl: Optional[int]) -> int:
+    """TTL for an archive document: it never outlives the messages it folds.
+
+    Expiring messages give the longest remaining lifetime (capped by
+    COSMOS_ARCHIVE_TTL when set). If any message never expires, the archive
+    uses COSMOS_ARCHIVE_TTL or -1 (no expiry, overriding the container default).
+    """
+    if any(e is None for e in expiries):
+        return archive_ttl or -1
+    remaining = max(1, math.ceil(max(expiries) - time.time()))
+    return min(remaining, archive_ttl) if archive_ttl else remaining
+
+
+def _flush_chunk(container: Any, session_id: str, chunk: List[Dict], chunk_bytes: int,
+                 archive_ttl: Optional[int]) -> Tuple[int, int]:
+    """Write one archive document and delete its originals in a single partition-scoped batch."""
+    archive = _archive_doc(session_id, chunk, archive_ttl)
+    operations = [("create", (archive,))] + [("delete", (m["id"],)) for m in chunk]
+    container.execute_item_batch(batch_operations=operations, partition_key=session_id)
+
+    reclaimed = max(chunk_bytes - _doc_size(archive), 0)
+    metrics.increment("compaction.archives_written")
+    metrics.increment("compaction.documents_reclaimed", len(chunk))
+    metrics.increment("compaction.bytes_reclaimed", reclaimed)
+    return len(chunk), reclaimed
+
+
+def compact_session(container: Any, session_id: str, keep_recent: int = COMPACTION_KEEP_RECENT,
+                    archive_ttl: Optional[int] = None, default_ttl: Optional[int] = None) -> Tuple[int, int]:
+    """Fold all but the `keep_recent` newest messages of a session into archive documents.
+
+    Each archive document replaces up to 99 messages atomically (transactional
+    batch), so a failure never loses or duplicates messages. Archive TTLs are
+    derived from the folded messages' expiry (`default_ttl` is the container
+    default for messages without their own `ttl`).
+
+    Returns:
+        Tuple of (documents_deleted, bytes_reclaimed)
+    """
+    count_query = "SELECT VALUE COUNT(1) FROM c WHERE IS_DEFINED(c.role)"
+    total = next(iter(container.query_items(query=count_query, partition_key=session_id)), 0)
+    to_archive = total - keep_recent
+    if to_archive <= 0:
+        return 0, 0
+
+    query = "SELECT * FROM c WHERE IS_DEFINED(c.role) ORDER BY c.ts ASC"
+    deleted, reclaimed = 0, 0
+    chunk: List[Dict] = []
+    expiries: List[Optional[float]] = []
+    chunk_bytes = 0
+
+    for item in container.query_items(query=query, partition_key=session_id, max_item_count=MAX_BATCH_OPERATIONS):
+        if to_archive <= 0:
+            break
+        # Stored size includes the system properties (_rid, _etag, ...) that the archive drops.
+        size = _doc_size(item)
+        message = {k: v for k, v in item.items() if not k.startswith("_")}
+
+        if chunk and (len(chunk) >= MAX_BATCH_OPERATIONS - 1 or chunk_bytes + size > MAX_ARCHIVE_BYTES):
+            d, r = _flush_chunk(container, session_id, chunk, chunk_bytes, _chunk_archive_ttl(expiries, archive_ttl))
+            deleted, reclaimed = deleted + d, reclaimed + r
+            chunk, expiries, chunk_bytes = [], [], 0
+
+        chunk.append(message)
+        expiries.append(_expires_at(item, default_ttl))
+        chunk_bytes += size
+        to_archive -= 1
+
+    if chunk:
+        d, r = _flush_chunk(container, session_id, chunk, chunk_bytes, _chunk_archive_ttl(expiries, archive_ttl))
+        deleted, reclaimed = deleted + d, reclaimed + r
+
+    return deleted, reclaimed
+
+
+def find_idle_sessions(container: Any, idle_seconds: int = COMPACTION_IDLE_SECONDS,
+                       max_sessions: int = COMPACTION_MAX_SESSIONS,
+                       keep_recent: int = COMPACTION_KEEP_RECENT) -> List[str]:
+    """Return up to `max_sessions` idle session ids that still have messages to compact.
+
+    A session is idle when its newest message is older than `idle_seconds`.
+    Sessions with at most `keep_recent` messages (e.g. already compacted) are
+    skipped and never use up `max_sessions`. The SDK only runs DISTINCT and
+    `VALUE <aggregate>` queries across partitions, so counts and the newest
+    timestamp are read with partition-scoped queries per candidate.
+    """
+    cutoff = (datetime.datetime.utcnow() - datetime.timedelta(seconds=idle_seconds)).isoformat()
+    candidates = container.query_items(
+        query="SELECT DISTINCT VALUE c.sessionId FROM c WHERE IS_DEFINED(c.role) AND c.ts < @cutoff",
+        parameters=[{"name": "@cutoff", "value": cutoff}],
+        enable_cross_partition_query=True
+    )
+
+    idle: List[str] = []
+    for session_id in candidates:
+        messages = next(iter(container.query_items(
+            query="SELECT VALUE COUNT(1) FROM c WHERE IS_DEFINED(c.role)", partition_key=session_id
+        )), 0)
+        if messages <= keep_recent:
+            continue
+        last_ts = next(iter(container.query_items(
+            query="SELECT VALUE MAX(c.ts) FROM c WHERE IS_DEFINED(c.role)", partition_key=session_id
+        )), None)
+        if last_ts is not None and last_ts < cutoff:
+            idle.append(session_id)
+            if len(idle) >= max_sessions:
+                break
+    return idle
+
+
+def compact_idle_sessions(store: Any, idle_seconds: int = COMPACTION_IDLE_SECONDS,
+                          keep_recent: int = COMPACTION_KEEP_RECENT,
+                          max_sessions: int = COMPACTION_MAX_SESSIONS) -> Dict[str, int]:
+    """Run one compaction pass over idle sessions and return a summary of the work done."""
+    archive_ttl = int(COSMOS_ARCHIVE_TTL) if COSMOS_ARCHIVE_TTL else None
+    summary = {"sessions": 0, "documents_reclaimed": 0, "bytes_reclaimed": 0}
+
+    for session_id in find_idle_sessions(store.container, idle_seconds, max_sessions, keep_recent):
+        try:
+            deleted, reclaimed = compact_session(store.container, session_id, keep_recent, archive_ttl,
+                                                 getattr(store, "default_ttl", None))
+        except Exception:
+            logger.exception("Compaction failed for session %s", session_id)
+            metrics.increment("compaction.failures")
+            continue
+        if deleted:
+            summary["sessions"] += 1
+            summary["documents_reclaimed"] += deleted
+            summary["bytes_reclaimed"] += reclaimed
+            metrics.increment("compaction.sessions_compacted")
+
+    return summary
+
+
+def acquire_compaction_lease(container: Any, owner: str, duration: float) -> bool:
+    """Take or renew the compaction lease for `duration` seconds; False while another owner holds it.
+
+    The lease is a document in the conversations container updated with an
+    etag precondition, so of the workers racing for an expired lease exactly
+    one wins.
+    """
+    from azure.core import MatchConditions
+    from azure.cosmos.exceptions import (CosmosAccessConditionFailedError, CosmosResourceExistsError,
+                                         CosmosResourceNotFoundError)
+
+    now = time.time()
+    try:
+        lease = container.read_item(item=COMPACTION_LEASE_ID, partition_key=COMPACTION_LEASE_ID)
+    except CosmosResourceNotFoundError:
+        try:
+            container.create_item(body={"id": COMPACTION_LEASE_ID, "sessionId": COMPACTION_LEASE_ID, "type": "lease",
+                                        "owner": owner, "expiresAt": now + duration})
+            return True
+        except CosmosResourceExistsError:
+            return False
+
+    if lease.get("owner") != owner and lease.get("expiresAt", 0) > now:
+        return False
+    body = {k: v for k, v in lease.items() if not k.startswith("_")}
+    body.update(owner=owner, expiresAt=now + duration)
+    try:
+        container.replace_item(item=COMPACTION_LEASE_ID, body=body, etag=lease["_etag"],
+                               match_condition=MatchConditions.IfNotModified)
+        return True
+    except CosmosAccessConditionFailedError:
+        return False
+
+
+async def run_compaction_loop(store: Any, interval: int = COMPACTION_INTERVAL_SECONDS) -> None:
+    """Periodically compact idle sessions in a worker thread until cancelled.
+
+    Every worker runs this loop, but only the holder of the compaction lease
+    runs a pass; the lease outlives two intervals, so another worker takes
+    over when the holder stops.
+    """
+    owner = f"{socket.gethostname()}-{os.getpid()}"
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await asyncio.to_thread(acquire_compaction_lease, store.container, owner, 2 * interval):
+                continue
+            summary = await asyncio.to_thread(compact_idle_sessions, store)
+            if summary["sessions"]:
+                logger.info("Compaction pass: %s", summary)
+        except Exception:
+            logger.exception("Compaction pass failed")
@@ -1,9 +1,10 @@
+import os
 import datetime
 import uuid
 import logging
 
-from typing import Any, List, Optional, Dict
-from azure.cosmos import CosmosClient, PartitionKey
+from typing import Any, Iterator, List, Optional, Dict, Tuple
+from services import metrics
 from semantic_kernel.contents.chat_history import ChatHistory
 from semantic_kernel.contents import ChatMessageContent
 from semantic_kernel.contents.utils.author_role import AuthorRole
@@ -19,52 +20,117 @@ class CosmosConversationMemory:
     - Full ChatHistory rendering via as_text()
     """
 
-    def __init__(self, container: Any, session_id: str, max_items: int = 5) -> None:
+    def __init__(self, container: Any, session_id: str, max_items: int = 5, persist: bool = True,
+                 cache: Any = None, cache_window: int = 20, message_ttl: Optional[int] = None) -> None:
         self.container = container
         self.session_id = session_id
         self.max_items = max_items
+        # When False (or without a container) messages are kept in the in-memory ChatHistory only.
+        self.persist = persist and container is not None
+        # Optional shared cache (services.cache.CacheBackend) holding the last `cache_window` messages.
+        self.cache = cache
+        self.cache_window = cache_window
+        # Optional per-document time-to-live (seconds) applied to persisted messages.
+        self.message_ttl = message_ttl
 
         # Keep an in-memory ChatHistory to satisfy the user's request to use that class.
         if ChatHistory is None:
             raise RuntimeError("semantic-kernel is required for ChatHistory but not available")
 
         self.chat_history = ChatHistory()
+        self.last_message_id: Optional[str] = None
 
         # Load existing messages from Cosmos and populate the ChatHistory
-        self._load_history_from_cosmos()
+        if self.container is not None:
+            self._load_history_from_cosmos()
+
+    @property
+    def _cache_key(self) -> str:
+        return f"history:{self.session_id}"
+
+    @property
+    def _cache_version_key(self) -> str:
+        # Changed by every persisted message; lets a reader detect writes that raced its Cosmos query.
+        return f"history-version:{self.session_id}"
 
     def _load_history_from_cosmos(self) -> None:
-        """Load conversation history from Cosmos DB into ChatHistory object."""
+        """Load conversation history (shared cache first, then Cosmos DB) into ChatHistory object."""
         try:
-            query = """
-                SELECT c.role, c.content, c.name, c.metadata, c.ts 
-                FROM c
-                WHERE c.sessionId = @sid
-                ORDER BY c.ts DESC
-                OFFSET 0 LIMIT @max_items
-            """
-            params = [
-                {"name": "@sid", "value": self.session_id},
-                {"name": "@max_items", "value": self.max_items}
-            ]
-            items = list(self.container.query_items(query=query, parameters=params, enable_cross_partition_query=True))
-
-            # Reverse to get chronological order
-            items = list(reversed(items))
-
-            for item in items:
+            items = self._load_items_from_cache()
+            if items is None:
+                items = self._query_recent_items()
+
+            for item in items[-self.max_items:]:
                 self._add_message_to_chat_history(
                     role=item.get("role"),
                     content=item.get("content"),
                     name=item.get("name"),
                     metadata=item.get("metadata", {})
                 )
-                        
+
         except Exception as e:
             logging.warning(f"Failed to load chat history from Cosmos: {e}")
             # If the query fails, don't block initialization; keep an empty ChatHistory
             pass
 
+    def _load_items_from_cache(self) -> Optional[List[Dict]]:
+        """Return cached items in chronological order, or None when the cache can't serve the window."""
+        if self.cache is None:
+            return None
+        try:
+            items = self.cache.get_list(self._cache_key)
+        except Exception as e:
+            logging.warning(f"Failed to read chat history from cache: {e}")
+            return None
+
+        # A full cache window only covers requests for up to `cache_window` messages.
+        if items is None or (len(items) >= self.cache_window and self.max_items > self.cache_window):
+            metrics.increment("cache.history.miss")
+            return None
+        metrics.increment("cache.history.hit")
+        return items
+
+    def _query_recent_items(self) -> List[Dict]:
+        """Query the most recent messages from Cosmos DB (chronological) and refresh the cache.
+
+        The cache is only refreshed if no message was persisted meanwhile: a write racing
+        the query would otherwise be missing from the cached window until it expires.
+        """
+        version = None
+        if self.cache is not None:
+            try:
+                version = self.cache.get(self._cache_version_key)
+            except Exception as e:
+                logging.warning(f"Failed to read chat history version from cache: {e}")
+        limit = max(self.max_items, self.cache_window) if self.cache is not None else self.max_items
+        query = """
+            SELECT c.role, c.content, c.name, c.metadata, c.ts 
+            FROM c
+            WHERE c.sessionId = @sid AND IS_DEFINED(c.role)
+            ORDER BY c.ts DESC
+            OFFSET 0 LIMIT @max_items
+        """
+        params = [
+            {"name": "@sid", "value": self.session_id},
+            {"name": "@max_items", "value": limit}
+        ]
+        items = list(self.container.query_items(query=query, parameters=params, enable_cross_partition_query=True))
+
+        # Reverse to get chronological order
+        items = list(reversed(items))
+
+        if self.cache is not None:
+            try:
+                self.cache.set_list(self._cache_key, items, self.cache_window)
+                # Writers bump the version before appending, so a changed version means the
+                # window may lack a message whose append found no list: drop it instead.
+                if self.cache.get(self._cache_version_key) != version:
+                    self.cache.delete(self._cache_key)
+                    metrics.increment("cache.history.stale")
+            except Exception as e:
+                logging.warning(f"Failed to write chat history to cache: {e}")
+        return items
+
     def _add_message_to_chat_history(self, role: str, content: str, name: Optional[str] = None, metadata: Optional[Dict] = None) -> None:
         """Add a message to the ChatHistory with support for roles and names."""
         # Convert string role to AuthorRole enum
@@ -94,10 +160,16 @@ class CosmosConversationMemory:
         """Add a message with specified role, content, name and metadata."""
         # Update in-memory ChatHistory first
         self._add_message_to_chat_history(role, content, name, metadata)
-        
+
+        # The document id doubles as the response id clients use to send feedback.
+        self.last_message_id = str(uuid.uuid4())
+
+        if not self.persist:
+            return
+
         # Persist to Cosmos
         doc = {
-            "id": str(uuid.uuid4()),
+            "id": self.last_message_id,
             "sessionId": self.session_id,
             "role": role.lower() if isinstance(role, str) else role.value.lower(),
             "content": content.strip(),
@@ -106,8 +178,22 @@ class CosmosConversationMemory:
             "ts": datetime.datetime.utcnow().isoformat(),
             "usedTools": used_tools or [],
         }
+        if self.message_ttl:
+            doc["ttl"] = self.message_ttl
         self.container.create_item(body=doc)
 
+        if self.cache is not None:
+            try:
+                cached = {k: doc[k] for k in ("role", "content", "name", "metadata", "ts")}
+                self.cache.set(self._cache_version_key, self.last_message_id)
+                self.cache.append_list(self._cache_key, cached, self.cache_window)
+            except Exception as e:
+                logging.warning(f"Failed to append chat history to cache: {e}")
+                try:
+                    self.cache.delete(self._cache_key)  # Never leave a window without this message
+                except Exception:
+                    pass
+
     def add_user_message(self, content: str, name: Optional[str] = None, 
                         metadata: Optional[Dict] = None) -> None:
         """Add a user message with optional name and metadata."""
@@ -145,6 +231,13 @@ class CosmosConversationMemory:
         return len(self.chat_history.messages)
 
 
+# Cosmos transactional batches are limited to 100 operations (and 2 MB) per partition.
+MAX_BATCH_OPERATIONS = 100
+
+# Fields of a persisted message document that may be projected by history queries.
+MESSAGE_FIELDS = ("id", "role", "content", "name", "metadata", "ts", "usedTools")
+
+
 class CosmosConversationStore:
     """Helper to manage Cosmos DB client + container for conversation history."""
     def __init__(
@@ -153,24 +246,130 @@ class CosmosConversationStore:
         key: str | None,
         database: str,
         container: str,
-        create_if_not_exists: bool = True
+        create_if_not_exists: bool = True,
+        cache: Any = None,
+        default_ttl: Optional[int] = None,
+        message_ttl: Optional[int] = None
     ) -> None:
-        if CosmosClient is None:
+        # Imported lazily so processes without Cosmos DB configured skip loading the SDK.
+        try:
+            from azure.cosmos import CosmosClient, PartitionKey
+        except ImportError:
             raise RuntimeError("azure-cosmos not available")
 
         if not key:
             raise RuntimeError("COSMOS_KEY not provided for key-based auth")
         
         self.client = CosmosClient(endpoint, key)
+        # Optional history cache (services.cache.CacheBackend); process-local caches would serve stale windows
+        self.cache = cache if getattr(cache, "shared", False) else None
+        self.message_ttl = message_ttl
+
+        # Per-document TTLs only take effect when TTL is enabled on the container (-1 = no default expiry).
+        if message_ttl and default_ttl is None:
+            default_ttl = -1
+        self.default_ttl = default_ttl
 
         if create_if_not_exists:
             self.database = self.client.create_database_if_not_exists(database)
             self.container = self.database.create_container_if_not_exists(
-                id=container, partition_key=PartitionKey(path="/sessionId")
+                id=container, partition_key=PartitionKey(path="/sessionId"), default_ttl=default_ttl
             )
         else:
             self.database = self.client.get_database_client(database)
             self.container = self.database.get_container_client(container)
 
-    def get_memory(self, session_id: str, max_items: int = 5) -> CosmosConversationMemory:
-        return CosmosConversationMemory(self.container, session_id, max_items=max_items)
+        if default_ttl is not None:
+            self._ensure_default_ttl(default_ttl)
+
+    def _ensure_default_ttl(self, default_ttl: int) -> None:
+        """Apply the container-level TTL to an existing container when it differs.
+
+        The existing indexing and conflict resolution policies are passed through,
+        since `replace_container` resets any policy it is not given.
+        """
+        from azure.cosmos import PartitionKey
+
+        try:
+            properties = self.container.read()
+            if properties.get("defaultTtl") != default_ttl:
+                self.database.replace_container(
+                    self.container,
+                    partition_key=PartitionKey(path="/sessionId"),
+                    indexing_policy=properties.get("indexingPolicy"),
+                    conflict_resolution_policy=properties.get("conflictResolutionPolicy"),
+                    default_ttl=default_ttl
+                )
+        except Exception:
+            logging.exception("Failed to apply default TTL %s to the conversations container", default_ttl)
+
+    @classmethod
+    def from_env(cls, cache: Any = None) -> Optional["CosmosConversationStore"]:
+        """Create a store from COSMOS_* environment variables, or return None when not configured."""
+        cosmos_endpoint = os.environ.get("COSMOS_ENDPOINT")
+        cosmos_key = os.environ.get("COSMOS_KEY")
+        if not cosmos_endpoint or not cosmos_key:
+            return None
+        default_ttl = os.environ.get("COSMOS_DEFAULT_TTL")
+        message_ttl = os.environ.get("COSMOS_MESSAGE_TTL")
+        return cls(
+            cosmos_endpoint,
+            cosmos_key,
+            os.environ.get("COSMOS_DB", "agent_db"),
+            os.environ.get("COSMOS_CONTAINER", "conversations"),
+            cache=cache,
+            default_ttl=int(default_ttl) if default_ttl else None,
+            message_ttl=int(message_ttl) if message_ttl else None
+        )
+
+    def get_memory(self, session_id: str, max_items: int = 5, persist: bool = True) -> CosmosConversationMemory:
+        return CosmosConversationMemory(self.container, session_id, max_items=max_items, persist=persist,
+                                        cache=self.cache, message_ttl=self.message_ttl)
+
+
+    def _messages_query(self, session_id: str, fields: Optional[List[str]] = None) -> Tuple[str, List, List[str]]:
+        """Partition-scoped query over a session's messages and archives (chronological), projecting `fields`."""
+        projected = [f for f in (fields or MESSAGE_FIELDS) if f in MESSAGE_FIELDS] or list(MESSAGE_FIELDS)
+        query = f"""
+            SELECT {", ".join(f"c.{f}" for f in projected)}, c.type, c.messages
+            FROM c
+            WHERE c.sessionId = @sid AND (IS_DEFINED(c.role) OR c.type = "archive")
+            ORDER BY c.ts ASC
+        """
+        return query, [{"name": "@sid", "value": session_id}], projected
+
+    @staticmethod
+    def _expand_archives(items: List[Dict], projected: List[str]) -> List[Dict]:
+        """Replace compacted archive documents with the messages they fold, projected to `projected`."""
+        messages: List[Dict] = []
+        for item in items:
+            if item.pop("type", None) == "archive":
+                messages.extend({f: m[f] for f in projected if f in m} for m in item.get("messages") or [])
+            else:
+                item.pop("messages", None)
+                messages.append(item)
+        return messages
+
+    def query_messages_page(self, session_id: str, page_size: int = 50, continuation_token: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Return one page of a session's messages and the continuation token for the next page (or None).
+
+        `page_size` counts stored documents: a compacted archive on the page expands into all of its messages.
+        """
+        query, params, projected = self._messages_query(session_id, fields)
+        pager = self.container.query_items(
+            query=query, parameters=params, partition_key=session_id, max_item_count=page_size
+        ).by_page(continuation_token)
+        page = next(pager, None)
+        items = self._expand_archives(list(page), projected) if page is not None else []
+        return items, pager.continuation_token
+
+    def iter_message_pages(self, session_id: str, page_size: int = 100,
+                           fields: Optional[List[str]] = None) -> Iterator[List[Dict]]:
+        """Yield a session's messages (archives expanded) page by page so only one page is held in memory."""
+        query, params, projected = self._messages_query(session_id, fields)
+        pager = self.container.query_items(
+            query=query, parameters=params, partition_key=session_id, max_item_count=page_size
+        ).by_page()
+        for page in pager:
+            yield self._expand_archives(list(page), projected)
@@ -0,0 +1,199 @@
+import os
+import time
+import asyncio
+import datetime
+import logging
+import threading
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import metrics
+from services.conversation_store import MAX_BATCH_OPERATIONS
+
+
+# Feedback buffering settings (override via environment).
+FEEDBACK_FLUSH_SIZE = int(os.getenv("FEEDBACK_FLUSH_SIZE", "100"))
+FEEDBACK_FLUSH_INTERVAL_SECONDS = float(os.getenv("FEEDBACK_FLUSH_INTERVAL_SECONDS", "5"))
+FEEDBACK_MAX_PENDING = int(os.getenv("FEEDBACK_MAX_PENDING", "10000"))
+FEEDBACK_STATS_TTL_SECONDS = float(os.getenv("FEEDBACK_STATS_TTL_SECONDS", "60"))
+
+# Client errors that may succeed on retry (timeout, throttling, retry-with); other 4xx never will.
+RETRYABLE_CLIENT_STATUSES = (408, 429, 449)
+
+logger = logging.getLogger("backend.app.services.feedback")
+
+
+class FeedbackBuffer:
+    """In-memory feedback buffer flushed in bulk to the conversations container.
+
+    `add` never touches the database: ratings are keyed by (session, response)
+    so repeated clicks collapse into the latest rating, and a background task
+    upserts them grouped by session partition when the buffer reaches
+    `flush_size` entries or every `flush_interval` seconds. Document ids are
+    derived from the response id, so retried flushes are idempotent. At most
+    `max_pending` ratings are held; further ratings are rejected until a flush
+    makes room.
+    """
+
+    def __init__(self, container: Any, flush_size: int = FEEDBACK_FLUSH_SIZE,
+                 flush_interval: float = FEEDBACK_FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = FEEDBACK_MAX_PENDING,
+                 stats_ttl: float = FEEDBACK_STATS_TTL_SECONDS) -> None:
+        self.container = container
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.stats_ttl = stats_ttl
+
+        self._pending: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+        self._flush_needed = asyncio.Event()
+
+        # Cross-partition aggregate counts, reused for `stats_ttl` seconds (refreshed by one caller at a time).
+        self._aggregate: Optional[Tuple[float, Dict[str, int]]] = None
+        self._aggregate_lock = threading.Lock()
+
+    def add(self, session_id: str, response_id: str, rating: int) -> bool:
+        """Buffer a rating (1 = thumbs up, 0 = thumbs down); returns False when the buffer is full."""
+        key = (session_id, response_id)
+        doc = {
+            "id": f"feedback-{response_id}",
+            "sessionId": session_id,
+            "type": "feedback",
+            "responseId": response_id,
+            "rating": rating,
+            "ts": datetime.datetime.utcnow().isoformat(),
+        }
+
+        with self._lock:
+            full = key not in self._pending and len(self._pending) >= self.max_pending
+            if not full:
+                self._pending[key] = doc
+            pending = len(self._pending)
+
+        if pending >= self.flush_size:
+            self._flush_needed.set()
+        if full:
+            metrics.increment("feedback.rejected")
+            return False
+        metrics.increment("feedback.received")
+        return True
+
+    def _count_ratings(self, session_id: Optional[str] = None) -> Dict[str, int]:
+        """Count persisted ratings: partition-scoped for a session, cross-partition aggregate otherwise."""
+        scope = {"partition_key": session_id} if session_id is not None else {"enable_cross_partition_query": True}
+        counts = {}
+        for bucket, rating in (("positive", 1), ("negative", 0)):
+            results = self.container.query_items(
+                query='SELECT VALUE COUNT(1) FROM c WHERE c.type = "feedback" AND c.rating = @rating',
+                parameters=[{"name": "@rating", "value": rating}],
+                **scope
+            )
+            counts[bucket] = sum(results)
+        return counts
+
+    def stats(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return satisfaction counters over persisted feedback, plus the session's counters when requested.
+
+        Synchronous (Cosmos SDK). Counts are read from the container, so every worker reports the
+        same numbers; the aggregate is a cross-partition scan and is cached for `stats_ttl` seconds.
+        `pending` is this worker's unflushed buffer, counted once flushed.
+        """
+        with self._lock:
+            pending = len(self._pending)
+        result: Dict[str, Any] = {"aggregate": self._with_ratio(self._aggregate_counts()), "pending": pending}
+        if session_id is not None:
+            result["session"] = self._with_ratio(self._count_ratings(session_id))
+        return result
+
+    def _aggregate_counts(self) -> Dict[str, int]:
+        with self._aggregate_lock:
+            if self._aggregate is None or self._aggregate[0] <= time.monotonic():
+                self._aggregate = (time.monotonic() + self.stats_ttl, self._count_ratings())
+            return self._aggregate[1]
+
+    @staticmethod
+    def _with_ratio(counts: Dict[str, int]) -> Dict[str, Any]:
+        total = counts["positive"] + counts["negative"]
+        return {**counts, "total": total, "satisfaction": round(counts["positive"] / total, 4) if total else None}
+
+    def flush(self) -> int:
+        """Upsert buffered feedback grouped by session partition; returns the number of documents written.
+
+        Synchronous (Cosmos SDK). Groups failing with a retryable error are re-queued unless a newer
+        rating arrived meanwhile; groups rejected by Cosmos are retried one document at a time so only
+        the rejected documents are dropped.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        by_session: Dict[str, List[Dict]] = {}
+        for (session_id, _), doc in pending.items():
+            by_session.setdefault(session_id, []).append(doc)
+
+        written = 0
+        for session_id, docs in by_session.items():
+            for i in range(0, len(docs), MAX_BATCH_OPERATIONS):
+                group = docs[i:i + MAX_BATCH_OPERATIONS]
+                try:
+                    self.container.execute_item_batch(
+                        batch_operations=[("upsert", (doc,)) for doc in group], partition_key=session_id
+                    )
+                    written += len(group)
+                except Exception as exc:
+                    logger.exception("Failed to flush %d feedback documents for session %s", len(group), session_id)
+                    metrics.increment("feedback.flush_failures")
+                    if _is_retryable(exc):
+                        self._requeue(session_id, group)
+                    else:
+                        written += self._upsert_each(session_id, group)
+
+        metrics.increment("feedback.flushed", written)
+        return written
+
+    def _upsert_each(self, session_id: str, docs: List[Dict]) -> int:
+        """Upsert documents individually after a rejected batch; drops those Cosmos rejects again."""
+        written = 0
+        for doc in docs:
+            try:
+                self.container.upsert_item(body=doc)
+                written += 1
+            except Exception as exc:
+                if _is_retryable(exc):
+                    self._requeue(session_id, [doc])
+                else:
+                    logger.warning("Dropping feedback document %r for session %s: %s", doc["id"], session_id, exc)
+                    metrics.increment("feedback.dropped")
+        return written
+
+    def _requeue(self, session_id: str, docs: List[Dict]) -> None:
+        with self._lock:
+            for doc in docs:
+                key = (session_id, doc["responseId"])
+                if key in self._pending:
+                    continue  # A newer rating for the same response replaces this one
+                if len(self._pending) >= self.max_pending:
+                    metrics.increment("feedback.dropped")
+                    continue
+                self._pending[key] = doc
+
+    async def run(self) -> None:
+        """Flush on size or time until cancelled; performs a final flush on cancellation."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_needed.clear()
+                await asyncio.to_thread(self.flush)
+        finally:
+            await asyncio.to_thread(self.flush)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Whether a failed write may succeed later (server errors, throttling, no status at all)."""
+    status = getattr(exc, "status_code", None)
+    return status is None or not 400 <= status < 500 or status in RETRYABLE_CLIENT_STATUSES
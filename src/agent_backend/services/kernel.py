@@ -1,38 +1,55 @@
 import os
 
-from dotenv import load_dotenv
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 
-load_dotenv()
+
+# Service ids used to register the chat completion deployments on the kernel.
+LARGE_SERVICE_ID = "large"
+SMALL_SERVICE_ID = "small"
 
 
 # Create and return a configured Semantic Kernel instance using API Management gateway.
-def create_kernel(endpoint: str | None = None, deployment: str | None = None, api_key: str | None = None):
+def create_kernel(endpoint: str | None = None, deployment: str | None = None, api_key: str | None = None,
+                  small_deployment: str | None = None):
     """
     Create a configured Semantic Kernel instance using API Management gateway.
-    
+
     Args:
         endpoint: APIM gateway endpoint URL
-        deployment: Model deployment name
+        deployment: Model deployment name (large tier, also the kernel default)
         api_key: APIM subscription key for authentication
+        small_deployment: Optional small/fast model deployment name for tiered routing
     """
     # API Management gateway configuration
     endpoint = endpoint or os.getenv("APIM_GATEWAY_ENDPOINT")
-    deployment = deployment or os.getenv("AI_MODEL_DEPLOYMENT") 
+    deployment = deployment or os.getenv("AI_MODEL_DEPLOYMENT")
     api_key = api_key or os.getenv("APIM_SUBSCRIPTION_KEY", "")
-    
+    small_deployment = small_deployment or os.getenv("AI_MODEL_DEPLOYMENT_SMALL")
+
     # Validate APIM configuration
     if not all([endpoint, deployment, api_key]):
         raise RuntimeError("Missing one or more API Management gateway variables: APIM_GATEWAY_ENDPOINT, AI_MODEL_DEPLOYMENT, APIM_SUBSCRIPTION_KEY")
 
     kernel = Kernel()
-    
+
+    # The large deployment is registered first so it remains the kernel default service.
     kernel.add_service(
         AzureChatCompletion(
+            service_id=LARGE_SERVICE_ID,
             deployment_name=deployment,
             endpoint=endpoint,
             api_key=api_key
         )
     )
+
+    if small_deployment and small_deployment != deployment:
+        kernel.add_service(
+            AzureChatCompletion(
+                service_id=SMALL_SERVICE_ID,
+                deployment_name=small_deployment,
+                endpoint=endpoint,
+                api_key=api_key
+            )
+        )
     return kernel
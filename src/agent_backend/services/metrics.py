@@ -0,0 +1,33 @@
+import threading
+
+from collections import Counter
+from typing import Dict, Optional
+
+
+# Process-local counters shared by the backend services.
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Increment the named counter by `value` (thread-safe)."""
+    with _lock:
+        _counters[name] += value
+
+
+def get_counter(name: str) -> int:
+    """Return the current value of a single counter (0 when never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def get_counters(prefix: Optional[str] = None) -> Dict[str, int]:
+    """Return a snapshot of all counters, optionally filtered by name prefix."""
+    with _lock:
+        return {k: v for k, v in sorted(_counters.items()) if prefix is None or k.startswith(prefix)}
+
+
+def reset_counters() -> None:
+    """Clear all counters."""
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,131 @@
+import os
+import re
+import logging
+
+from typing import Any, Dict, Optional
+
+from services import metrics
+from services.kernel import LARGE_SERVICE_ID, SMALL_SERVICE_ID
+
+
+# Keyword sets used by the local heuristics (lower-case, matched on word boundaries).
+_SMALL_TALK = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|thx|ok|okay|cool|great|bye|goodbye|good (morning|afternoon|evening))\b[\s!.?]*$",
+    re.IGNORECASE,
+)
+_WEATHER_INTENT = re.compile(r"\b(weather|temperature|forecast|hot|cold|rain|sunny)\b", re.IGNORECASE)
+_DOCS_INTENT = re.compile(
+    r"\b(azure|microsoft|learn|docs?|documentation|configure|deploy|architecture|bicep|sdk|api|"
+    r"explain|compare|difference|troubleshoot|why|design)\b",
+    re.IGNORECASE,
+)
+_HEDGING = re.compile(
+    r"\b(i('m| am) not sure|i do(n't| not) know|i can(not|'t) (answer|help|find)|unable to (answer|find|help)|"
+    r"no (relevant )?information)\b",
+    re.IGNORECASE,
+)
+
+# Thresholds for the heuristics; small enough that routing stays negligible next to a model call.
+SHORT_QUESTION_CHARS = 160
+# history_depth counts the messages in the loaded window (callers load 5), so the threshold must stay
+# below the window size to ever fire: a full window means the session is at least three turns deep.
+MAX_SMALL_HISTORY_DEPTH = 4
+
+
+class RoutingDecision:
+    """Tier selected for a single turn along with the reason used to pick it."""
+
+    def __init__(self, tier: str, reason: str) -> None:
+        self.tier = tier
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"RoutingDecision(tier={self.tier!r}, reason={self.reason!r})"
+
+
+def has_docs_intent(question: str) -> bool:
+    """Return True when a question looks like a Microsoft/Azure documentation question."""
+    return bool(_DOCS_INTENT.search(question or ""))
+
+
+def classify_turn(question: str, history_depth: int = 0) -> RoutingDecision:
+    """Classify a turn as small or large using cheap local heuristics.
+
+    Args:
+        question: User's question/input
+        history_depth: Number of messages already present in the conversation window
+
+    Returns:
+        RoutingDecision with the selected tier and the rule that matched
+    """
+    text = (question or "").strip()
+
+    if _SMALL_TALK.match(text):
+        return RoutingDecision(SMALL_SERVICE_ID, "small_talk")
+    if "```" in text or text.count("\n") > 2:
+        return RoutingDecision(LARGE_SERVICE_ID, "multiline")
+    if len(text) > SHORT_QUESTION_CHARS:
+        return RoutingDecision(LARGE_SERVICE_ID, "length")
+    if history_depth > MAX_SMALL_HISTORY_DEPTH:
+        return RoutingDecision(LARGE_SERVICE_ID, "history_depth")
+    if has_docs_intent(text):
+        return RoutingDecision(LARGE_SERVICE_ID, "docs_intent")
+    if _WEATHER_INTENT.search(text):
+        return RoutingDecision(SMALL_SERVICE_ID, "weather_intent")
+    return RoutingDecision(SMALL_SERVICE_ID, "short")
+
+
+def is_confident(question: str, answer: str) -> bool:
+    """Return False when an answer looks like it should be escalated to a larger model."""
+    text = (answer or "").strip()
+    if not text:
+        return False
+    if _HEDGING.search(text):
+        return False
+    # A one-liner in response to a substantive question is a weak signal of a poor answer.
+    if len((question or "").strip()) > 80 and len(text) < 20:
+        return False
+    return True
+
+
+class ModelRouter:
+    """Dispatch turns to one of several registered chat-completion agents (tiers).
+
+    Agents are keyed by the kernel service id they are bound to (`small`, `large`).
+    The large tier is the fallback for unknown tiers and the escalation target.
+    """
+
+    def __init__(self, agents: Dict[str, Any], default_tier: str = LARGE_SERVICE_ID, escalate: bool = True) -> None:
+        if default_tier not in agents:
+            raise ValueError(f"Default tier '{default_tier}' has no registered agent")
+        self.agents = dict(agents)
+        self.default_tier = default_tier
+        self.escalate = escalate
+
+    @classmethod
+    def from_env(cls, agents: Dict[str, Any]) -> "ModelRouter":
+        """Create a router using the MODEL_ROUTING_ESCALATION environment flag."""
+        escalate = os.getenv("MODEL_ROUTING_ESCALATION", "true").lower() in ("1", "true", "yes")
+        return cls(agents, escalate=escalate)
+
+    def route(self, question: str, history_depth: int = 0) -> RoutingDecision:
+        """Select the tier for a turn, falling back to the default tier when not registered."""
+        decision = classify_turn(question, history_depth)
+        if decision.tier not in self.agents:
+            decision = RoutingDecision(self.default_tier, f"{decision.reason}:unavailable")
+        metrics.increment(f"routing.selected.{decision.tier}")
+        logging.getLogger("backend.app.services.model_router").debug("Routed turn: %r", decision)
+        return decision
+
+    def agent_for(self, tier: str) -> Any:
+        """Return the agent for a tier, or the default tier's agent."""
+        return self.agents.get(tier) or self.agents[self.default_tier]
+
+    def escalation_tier(self, tier: str, question: str, answer: str) -> Optional[str]:
+        """Return the tier to retry with when the answer fails the confidence check, else None."""
+        if not self.escalate or tier == self.default_tier:
+            return None
+        if is_confident(question, answer):
+            return None
+        metrics.increment(f"routing.escalated.{tier}")
+        return self.default_tier
@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from services import metrics
+
+
+# Profiling settings (override via environment). Nothing is sampled unless enabled.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "20"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_HEADER = "X-Profile"
+
+_active_lock = threading.Lock()
+_active_profiles = 0
+
+
+class StackSampler:
+    """Statistical profiler sampling one thread's stack from a background thread.
+
+    Stacks are aggregated in collapsed format (`root;...;leaf` -> count), the
+    input format of flamegraph.pl and speedscope. The event loop thread runs
+    every coroutine, so samples include concurrent requests as well.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_SECONDS) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class LoopLagMonitor:
+    """Measure event-loop lag: how late a periodic sleep wakes up while a request runs."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - expected, 0.0))
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"maxMs": 0.0, "avgMs": 0.0, "samples": 0}
+        return {
+            "maxMs": round(max(self.samples) * 1000, 2),
+            "avgMs": round(sum(self.samples) / len(self.samples) * 1000, 2),
+            "samples": len(self.samples),
+        }
+
+
+class RequestProfile:
+    """Sampler and loop-lag monitor for one selected request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.id = f"{int(time.time() * 1000)}-{random.randrange(16 ** 6):06x}"
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.status_code: Optional[int] = None
+        self.sampler = StackSampler(threading.get_ident())
+        self.lag = LoopLagMonitor()
+
+    def start(self) -> None:
+        self.sampler.start()
+        self.lag.start()
+
+    def stop(self, duration: float, status_code: Optional[int]) -> None:
+        self.duration = duration
+        self.status_code = status_code
+        self.lag.stop()
+        self.sampler.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "statusCode": self.status_code,
+            "startedAt": self.started_at,
+            "durationMs": round(self.duration * 1000, 2),
+            "samples": sum(self.sampler.stacks.values()),
+            "loopLag": self.lag.summary(),
+        }
+
+    def collapsed(self) -> str:
+        """Return the profile in collapsed stack format (one `stack count` line per stack)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.sampler.stacks.most_common())
+
+
+class SlowestProfiles:
+    """Bounded store keeping the N slowest request profiles (min-heap on duration)."""
+
+    def __init__(self, capacity: int = PROFILE_MAX_STORED) -> None:
+        self.capacity = capacity
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        entry = (profile.duration, next(self._counter), profile)
+        with self._lock:
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            elif profile.duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return [p for _, _, p in sorted(self._heap, key=lambda e: e[0], reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((p for _, _, p in self._heap if p.id == profile_id), None)
+
+
+slowest_profiles = SlowestProfiles()
+
+
+def start_request_profile(request: Any) -> Optional[RequestProfile]:
+    """Start profiling a request when selected by header or sampling rate; returns None otherwise."""
+    global _active_profiles
+
+    if not PROFILING_ENABLED:
+        return None
+    requested = request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+    if not requested and not (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        return None
+    if request.url.path.startswith("/debug/"):
+        return None
+
+    # Cap concurrent profiles: each one runs a sampler thread.
+    with _active_lock:
+        if _active_profiles >= PROFILE_MAX_CONCURRENT:
+            return None
+        _active_profiles += 1
+
+    profile = RequestProfile(request.method, request.url.path)
+    profile.start()
+    return profile
+
+
+def finish_request_profile(profile: RequestProfile, duration: float, status_code: Optional[int] = None) -> None:
+    """Stop a request profile and keep it if it is among the slowest."""
+    global _active_profiles
+
+    profile.stop(duration, status_code)
+    with _active_lock:
+        _active_profiles -= 1
+    slowest_profiles.add(profile)
+    metrics.increment("profiling.captured")
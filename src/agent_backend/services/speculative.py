@@ -0,0 +1,129 @@
+import os
+import re
+import asyncio
+import contextvars
+import logging
+
+from typing import Any, Optional
+
+from services import metrics
+from services.model_router import has_docs_intent
+
+
+# Opt-in flag and tuning knobs for the speculative Microsoft Learn search.
+SPECULATIVE_LEARN_SEARCH = os.getenv("SPECULATIVE_LEARN_SEARCH", "false").lower() in ("1", "true", "yes")
+SPECULATIVE_MIN_OVERLAP = float(os.getenv("SPECULATIVE_MIN_OVERLAP", "0.6"))
+LEARN_SEARCH_TOOL = "microsoft_docs_search"
+
+_STOPWORDS = frozenset(
+    "a an and are as at be can do does for from how i in is it me my of on or the to what when where which who why with you".split()
+)
+
+logger = logging.getLogger("backend.app.services.speculative")
+
+
+class LearnPrefetch:
+    """A speculative Learn search started for one request (the per-request cache entry)."""
+
+    def __init__(self, question: str, task: asyncio.Task) -> None:
+        self.question = question
+        self.terms = _terms(question)
+        self.task = task
+        self.served = 0
+        self.mismatched = 0
+
+
+# Context-local prefetch for the current request, read by the wrapped Learn session.
+_current_prefetch: contextvars.ContextVar[Optional[LearnPrefetch]] = contextvars.ContextVar(
+    "current_learn_prefetch", default=None
+)
+
+# Undecorated Learn session call used to issue prefetches (set by install_learn_prefetch).
+_learn_call: Optional[Any] = None
+
+
+def _terms(text: str) -> set:
+    return {t for t in re.findall(r"\w+", (text or "").lower()) if t not in _STOPWORDS}
+
+
+def query_overlap(question_terms: set, query: str) -> float:
+    """Fraction of the model's search terms already present in the user's question."""
+    query_terms = _terms(query)
+    if not query_terms:
+        return 0.0
+    return len(query_terms & question_terms) / len(query_terms)
+
+
+def install_learn_prefetch(plugin: Any) -> None:
+    """Wrap the Learn plugin session so matching searches are served from the current prefetch.
+
+    No-op unless SPECULATIVE_LEARN_SEARCH is enabled.
+    """
+    global _learn_call
+
+    sess = getattr(plugin, "session", None)
+    if not SPECULATIVE_LEARN_SEARCH or sess is None or not hasattr(sess, "call_tool"):
+        return
+
+    orig_call = sess.call_tool
+
+    async def prefetching_call(tool_name, arguments=None, *a, **kw):
+        prefetch = _current_prefetch.get()
+        if prefetch is None or tool_name != LEARN_SEARCH_TOOL or prefetch.served:
+            # The prefetch answers at most one search per request; later searches go to the server.
+            return await orig_call(tool_name, arguments, *a, **kw)
+
+        query = (arguments or {}).get("query", "")
+        if query_overlap(prefetch.terms, query) >= SPECULATIVE_MIN_OVERLAP:
+            prefetch.served += 1  # Claimed before awaiting so concurrent searches don't share it
+            try:
+                result = await prefetch.task
+                if not getattr(result, "isError", False):
+                    metrics.increment("speculative.learn.hit")
+                    return result
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Speculative Learn search failed; issuing the model's search instead")
+            prefetch.served -= 1
+
+        prefetch.mismatched += 1
+        metrics.increment("speculative.learn.mismatch")
+        return await orig_call(tool_name, arguments, *a, **kw)
+
+    try:
+        setattr(sess, "call_tool", prefetching_call)
+        _learn_call = orig_call
+    except Exception:
+        pass
+
+
+def start_learn_prefetch(question: str) -> Optional[LearnPrefetch]:
+    """Start a Learn search with the raw question when it looks like a docs question.
+
+    The search runs concurrently with the first model hop; call
+    `finish_learn_prefetch` when the turn completes.
+    """
+    if _learn_call is None or not has_docs_intent(question) or len(_terms(question)) < 2:
+        return None
+
+    task = asyncio.ensure_future(_learn_call(LEARN_SEARCH_TOOL, {"query": question}))
+    prefetch = LearnPrefetch(question, task)
+    _current_prefetch.set(prefetch)
+    metrics.increment("speculative.learn.started")
+    return prefetch
+
+
+def finish_learn_prefetch(prefetch: Optional[LearnPrefetch]) -> None:
+    """Discard the prefetch for the current request and record whether it was used."""
+    if prefetch is None:
+        return
+    _current_prefetch.set(None)
+
+    if not prefetch.task.done():
+        prefetch.task.cancel()
+    elif not prefetch.task.cancelled():
+        prefetch.task.exception()  # Retrieve so failed prefetches are not reported as unhandled
+
+    if not prefetch.served:
+        metrics.increment("speculative.learn.unused")
@@ -0,0 +1,93 @@
+import os
+import sys
+import asyncio
+import logging
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+# Opt-in import-time audit emitted at startup (runs `python -X importtime` in a child process).
+IMPORT_TIME_AUDIT = os.getenv("IMPORT_TIME_AUDIT", "false").lower() in ("1", "true", "yes")
+IMPORT_TIME_AUDIT_TOP = int(os.getenv("IMPORT_TIME_AUDIT_TOP", "15"))
+
+# Backend root (the uvicorn --app-dir), so the child process resolves `app` and `services`.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("backend.app.services.startup")
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """Parse `-X importtime` stderr into (module, self_us, cumulative_us) tuples."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Header line
+        entries.append((parts[2].strip(), self_us, cumulative_us))
+    return entries
+
+
+def summarize_importtime(entries: List[Tuple[str, int, int]], top: int = IMPORT_TIME_AUDIT_TOP) -> Dict:
+    """Aggregate self time per top-level package; returns the total and the `top` slowest packages."""
+    by_package: Dict[str, int] = defaultdict(int)
+    for module, self_us, _ in entries:
+        by_package[module.split(".")[0]] += self_us
+
+    slowest = sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "totalMs": round(sum(by_package.values()) / 1000, 1),
+        "modules": len(entries),
+        "packages": [{"package": name, "ms": round(us / 1000, 1)} for name, us in slowest],
+    }
+
+
+async def audit_import_time(module: str = "app", top: int = IMPORT_TIME_AUDIT_TOP) -> Optional[Dict]:
+    """Import `module` in a fresh interpreter with `-X importtime` and summarize where the time goes.
+
+    A child process is used because the current interpreter has already
+    imported everything; cancelling the coroutine kills the child.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-X", "importtime", "-c", f"import {module}",
+        cwd=APP_DIR, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+
+    entries = parse_importtime(stderr.decode("utf-8", errors="replace"))
+    if proc.returncode != 0 or not entries:
+        logger.warning("Import time audit of %r failed (exit code %s)", module, proc.returncode)
+        return None
+    return summarize_importtime(entries, top)
+
+
+async def log_import_time_audit(module: str = "app") -> None:
+    """Run the import-time audit and log its summary (used as a background task at startup)."""
+    try:
+        summary = await audit_import_time(module)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Import time audit failed")
+        return
+    if summary is not None:
+        packages = ", ".join(f"{p['package']}={p['ms']}ms" for p in summary["packages"])
+        logger.warning("Import time audit: %sms over %d modules; slowest packages: %s",
+                       summary["totalMs"], summary["modules"], packages)
+
+
+# Run with: python -m services.startup [module]
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(asyncio.run(audit_import_time(sys.argv[1] if len(sys.argv) > 1 else "app")), indent=2))
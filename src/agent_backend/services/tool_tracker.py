@@ -1,6 +1,6 @@
 import contextvars
 
-from typing import Any, List, Optional
+from typing import Any, Callable, List, Optional
 
 
 # Context-local container for the current request's used_tools list.
@@ -8,6 +8,11 @@ _current_used_tools: contextvars.ContextVar[Optional[List[str]]] = contextvars.C
     "current_used_tools", default=None
 )
 
+# Context-local callback notified of each recorded tool invocation (e.g. to push progress events).
+_current_tool_listener: contextvars.ContextVar[Optional[Callable[[str], None]]] = contextvars.ContextVar(
+    "current_tool_listener", default=None
+)
+
 
 def create_used_tools_list() -> List[str]:
     """Return a fresh container for recording used tools (convenience).
@@ -38,11 +43,32 @@ def get_current_used_tools() -> List[str]:
     return lst if lst is not None else []
 
 
+def set_current_tool_listener(listener: Optional[Callable[[str], None]]) -> None:
+    """Set a per-request callback invoked with each tool entry as it is recorded.
+
+    The callback runs synchronously inside the tool wrapper and must not block.
+    Pass None to clear.
+    """
+    _current_tool_listener.set(listener)
+
+
+def record_tool_use(entry: str) -> None:
+    """Append an entry to the current used_tools list and notify the current listener."""
+    get_current_used_tools().append(entry)
+    listener = _current_tool_listener.get()
+    if listener is not None:
+        try:
+            listener(entry)
+        except Exception:
+            pass
+
+
 def wrap_call_tool(plugin: Any, name_attr: str = "call_tool") -> None:
     """Wrap a plugin (and its session) to record tool invocations.
 
-    The wrapper appends entries to `get_current_used_tools()` so callers can set
-    a per-request list with `set_current_used_tools()`.
+    The wrapper records entries via `record_tool_use()` so callers can set a
+    per-request list with `set_current_used_tools()` and an optional progress
+    callback with `set_current_tool_listener()`.
     """
     if plugin is None:
         return
@@ -67,10 +93,10 @@ def wrap_call_tool(plugin: Any, name_attr: str = "call_tool") -> None:
                                 or getattr(arg0, "name", None)
                                 or repr(arg0)
                             )
-                        get_current_used_tools().append(f"{plugin_name}:{tool_name}")
+                        record_tool_use(f"{plugin_name}:{tool_name}")
                     return await orig(*args, **kwargs)
                 except Exception:
-                    get_current_used_tools().append(f"{plugin_name}:call_failed")
+                    record_tool_use(f"{plugin_name}:call_failed")
                     raise
 
             try:
@@ -97,9 +123,9 @@ def wrap_call_tool(plugin: Any, name_attr: str = "call_tool") -> None:
                         params_info.extend([f"{k}: {repr(v)}" for k, v in kw.items()])
                     
                     params_str = f"{','.join(params_info)}" if params_info else ""
-                    get_current_used_tools().append(f"{plugin_name}.{tn}.{params_str}")
+                    record_tool_use(f"{plugin_name}.{tn}.{params_str}")
                 except Exception:
-                    get_current_used_tools().append(f"{plugin_name}.unknown")
+                    record_tool_use(f"{plugin_name}.unknown")
                 return await orig_sess_call(tool_name, *a, **kw)
 
             try:
@@ -1,12 +1,24 @@
 import os
+import ssl
+import json
+import bisect
+import hashlib
+import asyncio
 import logging
 import httpx
+import websockets
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from collections import OrderedDict
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
+try:
+    import orjson
+except ImportError:  # Optional dependency, falls back to the standard library JSONResponse
+    orjson = None
+
 
 # Configure logging
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -17,10 +29,75 @@ logger = logging.getLogger("frontend.app")
 backend_url = os.getenv("AGENT_BACKEND_CHAT_URL", "http://127.0.0.1:8000/chat")
 
 
+# Derive the backend WebSocket URL from the chat URL unless configured explicitly.
+def _derive_ws_url(chat_url: str) -> str:
+    ws_url = "ws" + chat_url[len("http"):] if chat_url.startswith("http") else chat_url
+    return ws_url[:-len("/chat")] + "/ws/chat" if ws_url.endswith("/chat") else ws_url.rstrip("/") + "/ws/chat"
+
+
+backend_ws_url = os.getenv("AGENT_BACKEND_WS_URL") or _derive_ws_url(backend_url)
+
+# Read timeout (seconds) for backend chat calls.
+backend_timeout = float(os.getenv("AGENT_BACKEND_TIMEOUT", "30"))
+
+
+class HashRing:
+    """Consistent hash ring mapping session ids to backend URLs.
+
+    Adding or removing a backend only remaps the sessions that hashed to it,
+    so most sessions keep landing on a backend with a warm history cache.
+    """
+
+    def __init__(self, nodes: list[str], replicas: int = 100) -> None:
+        self._ring: list[tuple[int, str]] = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+# Optional comma-separated list of backend chat URLs; sessions are pinned to one by consistent hashing.
+backend_urls = [u.strip() for u in os.getenv("AGENT_BACKEND_CHAT_URLS", "").split(",") if u.strip()] or [backend_url]
+backend_ring = HashRing(backend_urls)
+
+
+# Backend instance (X-Session-Affinity header) that last served each session, bounded LRU.
+SESSION_AFFINITY_MAX = 10000
+session_affinity: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _affinity_headers(session_id: str) -> dict:
+    """Replay the session's backend instance as App Service ARR affinity cookies."""
+    instance = session_affinity.get(session_id)
+    if not instance:
+        return {}
+    session_affinity.move_to_end(session_id)
+    return {"Cookie": f"ARRAffinity={instance}; ARRAffinitySameSite={instance}"}
+
+
+def _remember_affinity(session_id: str, headers) -> None:
+    """Record the backend instance (X-Session-Affinity response/handshake header) serving a session."""
+    instance = headers.get("X-Session-Affinity")
+    if not instance:
+        return
+    session_affinity[session_id] = instance
+    session_affinity.move_to_end(session_id)
+    while len(session_affinity) > SESSION_AFFINITY_MAX:
+        session_affinity.popitem(last=False)
+
+
 # Initialize FastAPI app
 app = FastAPI(title="AI Agent Frontend",
               description="AI Agent Frontend built on Semantic Kernel SDK for Python + FastAPI",
               version="0.0.1",
+              default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
               debug=False)
 
 
@@ -45,7 +122,7 @@ def index(request: Request):
 
 
 # Set up chat route
-@app.post("/chat", tags=["chat_endpoint"], response_class=JSONResponse)
+@app.post("/chat", tags=["chat_endpoint"])
 async def chat(request: Request):
     try:
         body = await request.json()
@@ -59,7 +136,7 @@ async def chat(request: Request):
     if not isinstance(session_id, str) or not session_id:
         raise HTTPException(status_code=422, detail="session_id must be a non-empty string")
     if not isinstance(chat_input, str) or not chat_input.strip():
-        return {"agent_response": "", "response_id": session_id, "used_tools": []}
+        return {"sessionId": session_id, "answer": "", "usedTools": []}
 
     payload = {
         "sessionId": session_id,
@@ -74,38 +151,209 @@ async def chat(request: Request):
     verify_ssl = os.getenv("AGENT_BACKEND_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
 
     try:
-        timeout = httpx.Timeout(30.0, connect=5.0)
+        timeout = httpx.Timeout(backend_timeout, connect=5.0)
         async with httpx.AsyncClient(verify=verify_ssl, timeout=timeout) as client:
-            resp = await client.post(backend_url, json=payload)
+            # Closing the backend connection when the browser goes away lets the backend cancel the turn.
+            call = asyncio.ensure_future(client.post(
+                backend_ring.node_for(session_id), json=payload, headers=_affinity_headers(session_id)
+            ))
+            while True:
+                done, _ = await asyncio.wait({call}, timeout=0.5)
+                if done:
+                    resp = call.result()
+                    break
+                if await request.is_disconnected():
+                    call.cancel()
+                    await asyncio.gather(call, return_exceptions=True)
+                    raise HTTPException(status_code=499, detail="Client closed request")
+    except httpx.TimeoutException as exc:
+        logger.error(f"Timed out calling external chat service: {exc}")
+        raise HTTPException(status_code=504, detail="External chat service timed out")
     except httpx.RequestError as exc:
         logger.error(f"Error calling external chat service: {exc}")
         raise HTTPException(status_code=502, detail="Failed to reach external chat service")
 
+    _remember_affinity(session_id, resp.headers)
+
     if resp.status_code != 200:
         logger.warning(f"External service returned status {resp.status_code}: {resp.text[:200]}")
         raise HTTPException(status_code=502, detail="External chat service error")
 
-    try:
-        data = resp.json()
-    except ValueError:
+    if not resp.headers.get("content-type", "").startswith("application/json"):
         raise HTTPException(status_code=502, detail="External chat service returned invalid JSON")
 
-    answer = data.get("answer", "")
-    used_tools = data.get("usedTools") or []
-    token_usage = data.get("tokenUsage")
-    ext_session = data.get("sessionId") or session_id
+    # Pass the backend ChatResponse bytes through untouched (no decode/re-encode of large tool traces);
+    # the browser reads the same fields as the WebSocket "done" frame.
+    return Response(content=resp.content, media_type="application/json")
 
-    response_data = {
-        "agent_response": answer,
-        "response_id": ext_session,
-        "used_tools": used_tools,
-    }
 
-    # Include token usage if available
-    if token_usage:
-        response_data["tokenUsage"] = token_usage
+def _derive_feedback_url(chat_url: str) -> str:
+    return chat_url[:-len("/chat")] + "/feedback" if chat_url.endswith("/chat") else chat_url.rstrip("/") + "/feedback"
+
+
+# Backend feedback URL, derived from the chat URL unless configured explicitly.
+backend_feedback_url = os.getenv("AGENT_BACKEND_FEEDBACK_URL") or _derive_feedback_url(backend_url)
+
+
+def _node_urls(node: str) -> tuple[str, str]:
+    """WebSocket and feedback URLs of a ring node; explicit overrides apply to the default backend."""
+    if node == backend_url:
+        return backend_ws_url, backend_feedback_url
+    return _derive_ws_url(node), _derive_feedback_url(node)
+
 
-    return response_data
+# Set up feedback route
+@app.post("/feedback", tags=["feedback_endpoint"], response_class=JSONResponse)
+async def feedback(request: Request):
+    try:
+        body = await request.json()
+    except Exception as exc:  # pragma: no cover - defensive
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {exc}")
+
+    session_id = body.get("session_id")
+    response_id = body.get("id")
+    rating = body.get("feedback_rating")
+
+    if not isinstance(session_id, str) or not session_id:
+        raise HTTPException(status_code=422, detail="session_id must be a non-empty string")
+    if not isinstance(response_id, str) or not response_id:
+        raise HTTPException(status_code=422, detail="id must be a non-empty string")
+    if rating not in (0, 1):
+        raise HTTPException(status_code=422, detail="feedback_rating must be 0 or 1")
+
+    payload = {"sessionId": session_id, "responseId": response_id, "rating": rating}
+
+    # Allow disabling TLS verification for local dev self-signed certs via env flag.
+    verify_ssl = os.getenv("AGENT_BACKEND_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
+
+    try:
+        timeout = httpx.Timeout(5.0, connect=5.0)
+        async with httpx.AsyncClient(verify=verify_ssl, timeout=timeout) as client:
+            # Same backend (ring node and instance) as the session's chat turns.
+            resp = await client.post(_node_urls(backend_ring.node_for(session_id))[1], json=payload,
+                                     headers=_affinity_headers(session_id))
+    except httpx.RequestError as exc:
+        logger.error(f"Error calling external feedback service: {exc}")
+        raise HTTPException(status_code=502, detail="Failed to reach external feedback service")
+
+    if resp.status_code not in (200, 202):
+        logger.warning(f"External feedback service returned status {resp.status_code}: {resp.text[:200]}")
+        raise HTTPException(status_code=502, detail="External feedback service error")
+
+    return {"status": "Feedback recorded"}
+
+
+# Set up chat WebSocket route (relays frames to the backend /ws/chat transport)
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Relay a browser's multiplexed chat socket to the backends serving its sessions.
+
+    Chat frames are routed like HTTP turns: to the session's ring node, with its
+    ARR affinity cookie. One upstream connection is opened per (node, instance)
+    and backend frames are relayed verbatim. Cancel frames follow their request
+    and pings are answered locally. If any upstream closes, the browser socket is
+    closed too so the page can reconnect.
+    """
+    await websocket.accept()
+
+    # Allow disabling TLS verification for local dev self-signed certs via env flag.
+    verify_ssl = os.getenv("AGENT_BACKEND_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
+    ssl_ctx = None
+    if not verify_ssl:
+        ssl_ctx = ssl.create_default_context()
+        ssl_ctx.check_hostname = False
+        ssl_ctx.verify_mode = ssl.CERT_NONE
+
+    upstreams: dict[tuple[str, str | None], websockets.ClientConnection] = {}
+    request_routes: "OrderedDict[str, websockets.ClientConnection]" = OrderedDict()
+    readers: list[asyncio.Task] = []
+    relay_done = asyncio.Event()
+
+    async def backend_to_client(upstream) -> None:
+        try:
+            async for message in upstream:
+                await websocket.send_text(message if isinstance(message, str) else message.decode("utf-8"))
+        except (WebSocketDisconnect, RuntimeError, websockets.exceptions.ConnectionClosed):
+            pass
+        finally:
+            relay_done.set()
+
+    async def upstream_for(session_id: str):
+        node = backend_ring.node_for(session_id)
+        key = (node, session_affinity.get(session_id))
+        upstream = upstreams.get(key)
+        if upstream is None:
+            ws_url = _node_urls(node)[0]
+            upstream = await websockets.connect(
+                ws_url, additional_headers=_affinity_headers(session_id), max_size=None,
+                ssl=ssl_ctx if ws_url.startswith("wss") else None
+            )
+            upstreams[key] = upstream
+            readers.append(asyncio.create_task(backend_to_client(upstream)))
+
+            # The handshake names the instance; sessions pinned to it later reuse this connection.
+            _remember_affinity(session_id, upstream.response.headers)
+            upstreams.setdefault((node, session_affinity.get(session_id)), upstream)
+        return upstream
+
+    async def client_to_backend() -> None:
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    frame = json.loads(text)
+                except ValueError:
+                    frame = None
+                if not isinstance(frame, dict):
+                    frame = {}
+
+                frame_type = frame.get("type")
+                if frame_type == "ping":
+                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    continue
+                if frame_type == "cancel":
+                    upstream = request_routes.get(frame.get("requestId"))
+                    if upstream is not None:
+                        await upstream.send(text)
+                    continue
+
+                # Chat (and malformed) frames go to the session's backend, which validates them.
+                session_id = frame.get("sessionId")
+                upstream = await upstream_for(session_id if isinstance(session_id, str) else "")
+                request_id = frame.get("requestId")
+                if isinstance(request_id, str):
+                    request_routes[request_id] = upstream
+                    while len(request_routes) > SESSION_AFFINITY_MAX:
+                        request_routes.popitem(last=False)
+                await upstream.send(text)
+        except (WebSocketDisconnect, websockets.exceptions.ConnectionClosed):
+            pass
+        finally:
+            relay_done.set()
+
+    close_code = 1000
+    client_task = asyncio.create_task(client_to_backend())
+    try:
+        # Ends when the browser leaves, an upstream closes, or an upstream cannot be reached.
+        await relay_done.wait()
+        if client_task.done():
+            client_task.result()
+    except (OSError, websockets.exceptions.WebSocketException) as exc:
+        logger.error(f"Error relaying to external chat WebSocket: {exc}")
+        close_code = 1011
+    finally:
+        # Closing the upstream connections cancels their in-flight turns.
+        client_task.cancel()
+        for upstream in set(upstreams.values()):
+            await upstream.close()
+        for task in readers:
+            task.cancel()
+        await asyncio.gather(client_task, *readers, return_exceptions=True)
+
+    try:
+        await websocket.close(code=close_code)
+    except Exception:
+        pass  # Browser side already closed
 
 
 # Health check endpoint